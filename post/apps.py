@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class PostConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'post'
+
+    def ready(self):
+        from . import detail_cache, scoring, signals
+        from .db import configure_sqlite
+        from .metrics import track_queries
+        from .search import install_triggers
+
+        connection_created.connect(configure_sqlite)
+        connection_created.connect(track_queries)
+        post_migrate.connect(install_triggers, sender=self)
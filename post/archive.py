@@ -0,0 +1,118 @@
+"""
+Hot/cold tiering of posts.
+
+archive() moves posts that were created and last active before a cutoff out
+of the hot tables into ArchivedPost, ArchivedComment and ArchivedReaction
+(the archive_posts command runs it for posts older than
+POST_ARCHIVE_AFTER_DAYS). Posts, comments and comment ids are kept, and the
+post's final like, dislike and comment counts are recounted from the rows
+being moved into its summary columns. Tags are kept as a list of names and
+the archived posts stop counting in Tag.post_cnt. Deleting the hot rows also
+drops their tag links, feed entries and search index rows, so the post list,
+search, tag pages, feeds and leaderboards only ever read hot rows.
+
+Each batch of posts is one transaction, so a post is either fully hot or
+fully archived. Archived posts are read-only: detail reads and the comment
+list fall back to the archive and render the same body as before, while
+writes to an archived post get a 404.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import leaderboard
+from .models import ArchivedComment, ArchivedPost, ArchivedReaction, Comment, Post, PostReaction, Tag
+
+
+def _after_days():
+    return getattr(settings, "POST_ARCHIVE_AFTER_DAYS", 365)
+
+
+def default_cutoff():
+    return timezone.now() - timedelta(days=_after_days())
+
+
+def candidates(cutoff):
+    """Posts that archive(cutoff) would move."""
+    return Post.objects.filter(created_at__lt=cutoff, activity_at__lt=cutoff)
+
+
+def archive(cutoff=None, batch_size=500):
+    """Move the posts older than cutoff to the archive; returns {"posts": n, "comments": n, "reactions": n}."""
+    cutoff = cutoff or default_cutoff()
+    moved = Counter(posts=0, comments=0, reactions=0)
+    while True:
+        with transaction.atomic():
+            # re-checked inside the transaction: a post touched since stays hot
+            ids = list(candidates(cutoff).select_for_update().order_by("pk").values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                break
+            moved.update(archive_batch(ids))
+    if moved["posts"]:
+        leaderboard.invalidate()
+    return dict(moved)
+
+
+def archive_batch(ids):
+    """Copy the posts ids and their children to the archive and delete them from the hot tables."""
+    posts = list(Post.objects.filter(pk__in=ids).prefetch_related("tag"))
+    comments = list(Comment.objects.filter(post__in=ids))
+    reactions = list(PostReaction.objects.filter(post__in=ids).values_list("post_id", "user_id", "reaction"))
+
+    comments_cnt = Counter(comment.post_id for comment in comments)
+    reaction_cnt = Counter((post_id, reaction) for post_id, _, reaction in reactions)
+    ArchivedPost.objects.bulk_create([
+        ArchivedPost(
+            id=post.id, title=post.title, writer=post.writer, content=post.content,
+            created_at=post.created_at, updated_at=post.updated_at,
+            image=post.image.name or None, image_variants=post.image_variants,
+            tags=[tag.name for tag in post.tag.all()],
+            like_cnt=reaction_cnt[post.id, "like"], dislike_cnt=reaction_cnt[post.id, "dislike"],
+            comments_cnt=comments_cnt[post.id], activity_at=post.activity_at,
+        )
+        for post in posts
+    ])
+    ArchivedComment.objects.bulk_create([
+        ArchivedComment(
+            id=comment.id, post_id=comment.post_id, writer_id=comment.writer_id, content=comment.content,
+            created_at=comment.created_at, updated_at=comment.updated_at,
+        )
+        for comment in comments
+    ], batch_size=1000)
+    ArchivedReaction.objects.bulk_create([
+        ArchivedReaction(post_id=post_id, user_id=user_id, reaction=reaction)
+        for post_id, user_id, reaction in reactions
+    ], batch_size=1000)
+
+    release_tags(posts)
+    Post.objects.filter(pk__in=ids).delete()
+    return {"posts": len(posts), "comments": len(comments), "reactions": len(reactions)}
+
+
+def release_tags(posts):
+    """Decrement Tag.post_cnt for posts (with their tags prefetched), one update per distinct decrement."""
+    counts = Counter(tag.id for post in posts for tag in post.tag.all())
+    by_count = defaultdict(list)
+    for tag_id, n in counts.items():
+        by_count[n].append(tag_id)
+    for n, tag_ids in by_count.items():
+        Tag.objects.filter(id__in=tag_ids).update(post_cnt=F("post_cnt") - n)
+
+
+def get_post(pk):
+    """The archived post pk, or None."""
+    try:
+        return ArchivedPost.objects.filter(pk=pk).first()
+    except (TypeError, ValueError):
+        return None
+
+
+def is_archived(pk):
+    try:
+        return ArchivedPost.objects.filter(pk=pk).exists()
+    except (TypeError, ValueError):
+        return False
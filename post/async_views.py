@@ -0,0 +1,162 @@
+"""
+Async (ASGI) variants of the hot read endpoints, mounted under /async/.
+
+They return the same bodies as their DRF counterparts but run on the event
+loop: rows are loaded with the async ORM and independent queries (a page and
+its count, a post and its comments) are awaited together. Filtering and
+search stay on the DRF endpoints.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from . import leaderboard
+from .models import ArchivedComment, ArchivedPost, Comment, Post, Tag
+from .paginations import CommentCursorPagination, PostCursorPagination, PostPagination, TagPagination
+from .serializers import (
+    ArchivedPostSerializer, CommentSerializer, PostListSerializer, PostSerializer, recent_comments,
+)
+from .tags import tag_posts
+
+POST_ORDERING_FIELDS = ["created_at", "updated_at", "like_cnt", "dislike_cnt"]
+
+
+def render(data, status=200):
+    # the first configured renderer is the JSON one DRF negotiates by default
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+    return HttpResponse(renderer.render(data), status=status, content_type=renderer.media_type)
+
+
+def not_found(model=None):
+    detail = f"No {model._meta.object_name} matches the given query." if model else "Invalid page."
+    return render({"detail": detail}, status=404)
+
+
+def context(request):
+    return {"request": Request(request)}
+
+
+def page_size(request, pagination):
+    try:
+        size = int(request.GET[pagination.page_size_query_param])
+    except (KeyError, ValueError):
+        return pagination.page_size
+    return min(max(size, 1), pagination.max_page_size)
+
+
+def post_ordering(request):
+    ordering = request.GET.get("ordering", "")
+    if ordering.lstrip("-") in POST_ORDERING_FIELDS:
+        return [ordering, "-id" if ordering.startswith("-") else "id"]
+    return ["-created_at", "-id"]
+
+
+async def posts_page(request, queryset):
+    if request.GET.get("pagination") == "cursor" or "cursor" in request.GET:
+        paginator = PostCursorPagination()
+        posts = await paginator.apaginate_queryset(queryset, Request(request))
+        data = PostListSerializer(posts, many=True, context=context(request)).data
+        return paginator.get_paginated_response(data).data
+
+    size = page_size(request, PostPagination)
+    try:
+        number = max(int(request.GET.get("page", 1)), 1)
+    except ValueError:
+        return None
+    offset = (number - 1) * size
+    ordered = queryset.order_by(*post_ordering(request))
+
+    async def rows():
+        return [post async for post in ordered[offset:offset + size]]
+
+    count, posts = await asyncio.gather(queryset.acount(), rows())
+    if number > 1 and not posts:
+        return None
+
+    url = request.build_absolute_uri()
+    previous = None
+    if number > 1:
+        previous = replace_query_param(url, "page", number - 1) if number > 2 else remove_query_param(url, "page")
+    return {
+        "count": count,
+        "next": replace_query_param(url, "page", number + 1) if offset + size < count else None,
+        "previous": previous,
+        "results": PostListSerializer(posts, many=True, context=context(request)).data,
+    }
+
+
+async def post_list(request):
+    data = await posts_page(request, Post.objects.prefetch_related("tag"))
+    return render(data) if data is not None else not_found()
+
+
+async def post_detail(request, post_id):
+    async def comments():
+        queryset = recent_comments(Comment.objects.filter(post_id=post_id))
+        return [comment async for comment in queryset.aiterator()]
+
+    try:
+        post, loaded = await asyncio.gather(
+            Post.objects.prefetch_related("tag").aget(pk=post_id), comments()
+        )
+    except Post.DoesNotExist:
+        return await archived_detail(request, post_id)
+    for comment in loaded:
+        comment.post = post
+    post.recent_comments = loaded
+    return render(PostSerializer(post, context=context(request)).data)
+
+
+async def archived_detail(request, post_id):
+    # see post.archive
+    try:
+        post = await ArchivedPost.objects.aget(pk=post_id)
+    except ArchivedPost.DoesNotExist:
+        return not_found(Post)
+    post.recent_comments = [comment async for comment in recent_comments(post.comments.all()).aiterator()]
+    return render(ArchivedPostSerializer(post, context=context(request)).data)
+
+
+async def post_comments(request, post_id):
+    is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+    if not is_authenticated:
+        return render({"detail": "Authentication credentials were not provided."}, status=403)
+
+    data = await comments_page(request, Comment.objects.filter(post_id=post_id))
+    comments = data["results"] if isinstance(data, dict) else data
+    if not comments and await ArchivedPost.objects.filter(pk=post_id).aexists():
+        data = await comments_page(request, ArchivedComment.objects.filter(post_id=post_id))
+    return render(data)
+
+
+async def comments_page(request, queryset):
+    queryset = queryset.select_related("post")
+    if request.GET.get("pagination") == "cursor" or "cursor" in request.GET:
+        paginator = CommentCursorPagination()
+        comments = await paginator.apaginate_queryset(queryset, Request(request))
+        data = CommentSerializer(comments, many=True).data
+        return paginator.get_paginated_response(data).data
+    comments = [comment async for comment in queryset.aiterator()]
+    return CommentSerializer(comments, many=True).data
+
+
+async def tag_page(request, tag_name):
+    try:
+        tag = await Tag.objects.aget(name=tag_name)
+    except Tag.DoesNotExist:
+        return not_found(Tag)
+    paginator = TagPagination()
+    posts = await paginator.apaginate_queryset(tag_posts(tag).prefetch_related("tag"), Request(request))
+    data = PostListSerializer(posts, many=True, context=context(request)).data
+    return render({"name": tag.name, "post_cnt": tag.post_cnt, **paginator.get_paginated_response(data).data})
+
+
+async def recommend(request):
+    window = request.GET.get("window", leaderboard.DEFAULT_WINDOW)
+    if window not in leaderboard.WINDOWS:
+        return render({"window": [f"choose one of {', '.join(leaderboard.WINDOWS)}"]}, status=400)
+    return render(await sync_to_async(leaderboard.get_top)(window, 3, "hot"))
@@ -0,0 +1,151 @@
+"""
+Helpers shared by the bench_* management commands.
+
+Benchmarks run against a throwaway test database so they never touch the
+project's real data. On SQLite it is a file in a temporary directory rather
+than the shared in-memory database, whose table-level locks would distort
+any multi-threaded measurement.
+
+seed_dataset fills a database with a reproducible synthetic load. Reactions,
+comments and hashtags follow a Zipf distribution, so a few posts and tags
+get most of the traffic, as they do in real use.
+"""
+import itertools
+import os
+import statistics
+import tempfile
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+
+from .models import Comment, Post, PostReaction, Tag
+from .scoring import score_of
+
+WORDS = (
+    "django rest framework serializer view model query index cache python "
+    "sqlite postgres search token ranking cursor page tag comment like coffee "
+    "travel music movie food study code bug deploy server client mobile"
+).split()
+
+
+@contextmanager
+def temporary_database():
+    old_name = connection.settings_dict["NAME"]
+    test_settings = connection.settings_dict.setdefault("TEST", {})
+    old_test_name = test_settings.get("NAME")
+    with tempfile.TemporaryDirectory() as directory:
+        if connection.vendor == "sqlite":
+            test_settings["NAME"] = os.path.join(directory, "bench.sqlite3")
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            test_settings["NAME"] = old_test_name
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def measure(fn, repeat=20, warmup=2):
+    """Call fn repeatedly and return latency stats in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+    }
+
+
+def zipf_weights(count, exponent):
+    """Cumulative weights for rng.choices where item i has weight 1 / (i + 1) ** exponent."""
+    return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def seed_dataset(rng, posts, users, comments, reactions, exponent=1.1, days=30, batch_size=5000):
+    """
+    Create users, tagged posts, comments and reactions, with every denormalized
+    counter set as the views would have left it. Returns the row counts.
+    """
+    now = timezone.now()
+    # reuse the seed users and tags of an earlier run
+    usernames = [f"seed{i}" for i in range(users)]
+    User.objects.bulk_create(
+        [User(username=name, password="!") for name in usernames], batch_size=batch_size, ignore_conflicts=True
+    )
+    user_objs = list(User.objects.filter(username__in=usernames))
+    Tag.objects.bulk_create([Tag(name=word) for word in WORDS], ignore_conflicts=True)
+    tags = Tag.objects.in_bulk(WORDS, field_name="name")
+    tag_weights = zipf_weights(len(WORDS), exponent)
+
+    post_tags = []
+    batch = []
+    for i in range(posts):
+        words = rng.choices(WORDS, k=12)
+        hashtags = set(rng.choices(WORDS, cum_weights=tag_weights, k=rng.randint(0, 3)))
+        post_tags.append(hashtags)
+        batch.append(Post(
+            title=" ".join(words[:3]), writer=f"writer{i % 500}",
+            content=" ".join(words + [f"#{name}" for name in sorted(hashtags)]),
+        ))
+    post_objs = Post.objects.bulk_create(batch, batch_size=batch_size)
+
+    tag_counts = Counter(name for names in post_tags for name in names)
+    for name, tag in tags.items():
+        tag.post_cnt += tag_counts[name]
+    Tag.objects.bulk_update(tags.values(), ["post_cnt"])
+
+    # popularity is independent of age: shuffle which posts are the hot ones
+    ranked = rng.sample(post_objs, len(post_objs))
+    post_weights = zipf_weights(len(ranked), exponent)
+
+    pairs = {}
+    for _ in range(reactions):
+        post = rng.choices(ranked, cum_weights=post_weights)[0]
+        pairs[post.id, rng.choice(user_objs).id] = "like" if rng.random() < 0.8 else "dislike"
+    PostReaction.objects.bulk_create(
+        [PostReaction(post_id=post_id, user_id=user_id, reaction=kind) for (post_id, user_id), kind in pairs.items()],
+        batch_size=batch_size,
+    )
+    commented = rng.choices(ranked, cum_weights=post_weights, k=comments)
+    Comment.objects.bulk_create(
+        [Comment(post=post, writer=rng.choice(user_objs), content=" ".join(rng.choices(WORDS, k=8)))
+         for post in commented],
+        batch_size=batch_size,
+    )
+
+    likes = Counter(post_id for (post_id, _), kind in pairs.items() if kind == "like")
+    dislikes = Counter(post_id for (post_id, _), kind in pairs.items() if kind == "dislike")
+    comment_counts = Counter(post.id for post in commented)
+    for post in post_objs:
+        post.created_at = now - timedelta(seconds=rng.randint(0, days * 86400))
+        post.like_cnt = likes[post.id]
+        post.dislike_cnt = dislikes[post.id]
+        post.comments_cnt = comment_counts[post.id]
+        post.hot_score = score_of(post)
+    Post.objects.bulk_update(
+        post_objs, ["created_at", "like_cnt", "dislike_cnt", "comments_cnt", "hot_score"], batch_size=batch_size
+    )
+    # linked once the final created_at is known, since the links carry a copy
+    through = Post.tag.through
+    through.objects.bulk_create(
+        [through(post_id=post.id, tag_id=tags[name].id, created_at=post.created_at)
+         for post, names in zip(post_objs, post_tags) for name in names],
+        batch_size=batch_size,
+    )
+    return {"users": users, "posts": posts, "comments": comments, "reactions": len(pairs), "tags": len(tags)}
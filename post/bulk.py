@@ -0,0 +1,343 @@
+"""
+Bulk NDJSON import and export of posts, comments and reactions.
+
+One JSON object per line, tagged by "type":
+
+    {"type": "post", "id": 1, "title": ..., "writer": ..., "content": ...,
+     "created_at": "2024-01-01T12:00:00", "tags": ["django"]}
+    {"type": "comment", "post": 1, "writer": "username", "content": ..., "created_at": ...}
+    {"type": "reaction", "post": 1, "user": "username", "reaction": "like"}
+
+export_lines writes every post, then every comment, then every reaction. It
+walks each table with .iterator(chunk_size=...), so memory use stays flat
+however many rows there are. Images are not exported.
+
+import_lines reads lines as they arrive and writes them with bulk_create, one
+transaction per batch of batch_size lines. Ids in the stream are source ids.
+A comment or reaction links to the post that was imported under that id
+earlier in the same stream. Users are looked up by username. Tags come from
+"tags", or from the content's hashtags when "tags" is missing. Invalid rows
+are skipped and reported by line number; a batch whose write fails is
+reported as a whole. The post counters, hot scores and Tag.post_cnt are
+brought up to date and new posts are fanned out to their tags' followers as
+each batch is written.
+"""
+import json
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.parsers import BaseParser
+
+from . import feed, leaderboard, scoring
+from .models import Comment, Post, PostReaction, PostTag, Tag
+from .signals import send_post_changed
+from .tags import TAG_MAX_LENGTH, extract_hashtags, resolve_tags
+
+MAX_REPORTED_ERRORS = 100
+REACTIONS = dict(PostReaction.REACTION_CHOICES)
+
+
+def _batch_size():
+    return getattr(settings, "POST_BULK_BATCH_SIZE", 1000)
+
+
+def _chunk_size():
+    return getattr(settings, "POST_BULK_CHUNK_SIZE", 2000)
+
+
+def _line(record):
+    return json.dumps(record, ensure_ascii=False).encode() + b"\n"
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def export_lines(chunk_size=None):
+    """Yield the NDJSON lines (bytes, newline-terminated) for all posts, comments and reactions."""
+    chunk_size = chunk_size or _chunk_size()
+    posts = Post.objects.order_by("pk").prefetch_related("tag")
+    for post in posts.iterator(chunk_size=chunk_size):
+        yield _line({
+            "type": "post", "id": post.id, "title": post.title, "writer": post.writer,
+            "content": post.content, "created_at": _isoformat(post.created_at),
+            "tags": [tag.name for tag in post.tag.all()],
+        })
+    comments = Comment.objects.order_by("pk").values_list("post_id", "writer__username", "content", "created_at")
+    for post_id, writer, content, created_at in comments.iterator(chunk_size=chunk_size):
+        yield _line({
+            "type": "comment", "post": post_id, "writer": writer, "content": content,
+            "created_at": _isoformat(created_at),
+        })
+    reactions = PostReaction.objects.order_by("pk").values_list("post_id", "user__username", "reaction")
+    for post_id, username, reaction in reactions.iterator(chunk_size=chunk_size):
+        yield _line({"type": "reaction", "post": post_id, "user": username, "reaction": reaction})
+
+
+class NDJSONParser(BaseParser):
+    """Hands the request stream to import_lines, which reads it a line at a time."""
+    media_type = "application/x-ndjson"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return stream if stream is not None else []
+
+
+class RowError(Exception):
+    pass
+
+
+class Importer:
+    KINDS = ("post", "comment", "reaction")
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or _batch_size()
+        self.post_ids = {}  # source id -> imported id
+        self.counts = Counter()
+        self.errors = []
+        self.error_count = 0
+
+    def report(self):
+        return {
+            "posts": self.counts["post"],
+            "comments": self.counts["comment"],
+            "reactions": self.counts["reaction"],
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def run(self, lines):
+        batch = []
+        for number, raw in enumerate(lines, 1):
+            if not raw.strip():
+                continue
+            try:
+                record = json.loads(raw)
+            except ValueError as exc:
+                self.error(number, f"invalid JSON: {exc}")
+                continue
+            if not isinstance(record, dict) or record.get("type") not in self.KINDS:
+                self.error(number, 'expected an object with "type" post, comment or reaction')
+                continue
+            batch.append((number, record))
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+                batch = []
+        if batch:
+            self.flush(batch)
+        leaderboard.invalidate()
+        return self.report()
+
+    def flush(self, batch):
+        rows = {kind: [(n, r) for n, r in batch if r["type"] == kind] for kind in self.KINDS}
+        post_ids = {}
+        # only counted into self.counts once the batch is committed
+        counts = Counter()
+        try:
+            with transaction.atomic():
+                post_ids, new_posts = self.import_posts(rows["post"], counts)
+                self.post_ids.update(post_ids)
+                parents = self.import_children("comment", rows["comment"], counts)
+                parents |= self.import_children("reaction", rows["reaction"], counts)
+                recount(parents)
+                scoring.refresh(new_posts | parents)
+                send_post_changed(Post, new_posts | parents)
+        except DatabaseError as exc:
+            for source_id in post_ids:
+                del self.post_ids[source_id]
+            self.error(batch[0][0], f"lines {batch[0][0]}-{batch[-1][0]} not imported: {exc}")
+        else:
+            self.counts.update(counts)
+
+    def import_posts(self, rows, counts):
+        """Insert the valid post rows with their tags; returns ({source id: id}, new ids)."""
+        posts, tag_names = [], []
+        for number, record in rows:
+            try:
+                post = Post(title=text(record, "title"), writer=text(record, "writer"), content=text(record, "content"))
+                post.clean_fields()
+                post.created_at = timestamp(record) or post.created_at
+                source = source_id(record, "id")
+                names = record.get("tags")
+                if names is None:
+                    names = extract_hashtags(post.content)
+                elif not isinstance(names, list) or not all(
+                    isinstance(name, str) and 0 < len(name) <= TAG_MAX_LENGTH for name in names
+                ):
+                    raise RowError(f'"tags" must be a list of names up to {TAG_MAX_LENGTH} characters')
+            except (RowError, ValidationError, ValueError, TypeError) as exc:
+                self.error(number, message(exc))
+                continue
+            posts.append((source, post))
+            tag_names.append(list(dict.fromkeys(names)))
+        if not posts:
+            return {}, set()
+
+        Post.objects.bulk_create([post for _, post in posts])
+
+        tags = resolve_tags(list({name for names in tag_names for name in names}))
+        through = Post.tag.through
+        through.objects.bulk_create([
+            through(post_id=post.id, tag_id=tags[name].id, created_at=post.created_at)
+            for (_, post), names in zip(posts, tag_names) for name in names
+        ])
+        increments = Counter(tags[name].id for names in tag_names for name in names)
+        for n in set(increments.values()):
+            tag_ids = [tag_id for tag_id, count in increments.items() if count == n]
+            Tag.objects.filter(id__in=tag_ids).update(post_cnt=F("post_cnt") + n)
+
+        feed.fan_out([post for _, post in posts], new=True)
+        counts["post"] += len(posts)
+        return {source_id: post.id for source_id, post in posts if source_id is not None}, {post.id for _, post in posts}
+
+    def import_children(self, kind, rows, counts):
+        """Insert the valid comment or reaction rows; returns the ids of their posts."""
+        if not rows:
+            return set()
+        user_field = "writer" if kind == "comment" else "user"
+        usernames = {r.get(user_field) for _, r in rows if isinstance(r.get(user_field), str)}
+        users = dict(User.objects.filter(username__in=usernames).values_list("username", "id"))
+        build = self.comment if kind == "comment" else self.reaction
+
+        objs = []
+        for number, record in rows:
+            try:
+                post_id = self.post_ids.get(source_id(record, "post"))
+                if post_id is None:
+                    raise RowError(f"unknown post {record.get('post')!r}")
+                user_id = users.get(record.get(user_field))
+                if user_id is None:
+                    raise RowError(f"unknown user {record.get(user_field)!r}")
+                objs.append((number, build(record, post_id, user_id)))
+            except (RowError, ValidationError, ValueError, TypeError) as exc:
+                self.error(number, message(exc))
+        if kind == "reaction":
+            objs = self.drop_duplicate_reactions(objs)
+        if not objs:
+            return set()
+
+        model = Comment if kind == "comment" else PostReaction
+        model.objects.bulk_create([obj for _, obj in objs])
+        if kind == "comment":
+            keep_created_at(Comment, [obj for _, obj in objs])
+        counts[kind] += len(objs)
+        return {obj.post_id for _, obj in objs}
+
+    def comment(self, record, post_id, user_id):
+        comment = Comment(post_id=post_id, writer_id=user_id, content=text(record, "content"))
+        comment.clean_fields(exclude=["post", "writer"])
+        comment._created_at = timestamp(record)
+        return comment
+
+    def reaction(self, record, post_id, user_id):
+        if record.get("reaction") not in REACTIONS:
+            raise RowError(f'"reaction" must be one of {", ".join(REACTIONS)}')
+        return PostReaction(post_id=post_id, user_id=user_id, reaction=record["reaction"])
+
+    def drop_duplicate_reactions(self, objs):
+        existing = set(PostReaction.objects.filter(
+            post_id__in={obj.post_id for _, obj in objs}, user_id__in={obj.user_id for _, obj in objs}
+        ).values_list("post_id", "user_id"))
+        kept = []
+        for number, obj in objs:
+            if (obj.post_id, obj.user_id) in existing:
+                self.error(number, "the user already reacted to this post")
+                continue
+            existing.add((obj.post_id, obj.user_id))
+            kept.append((number, obj))
+        return kept
+
+
+def keep_created_at(model, objs):
+    """Write back the source created_at that bulk_create overwrote (Comment.created_at is auto_now_add)."""
+    dated = [obj for obj in objs if obj._created_at is not None]
+    if not dated:
+        return
+    field = model._meta.get_field("created_at")
+    quote = connection.ops.quote_name
+    # one prepared UPDATE run per row; bulk_update's CASE expression is far slower to build
+    sql = "UPDATE {} SET {} = %s WHERE {} = %s".format(
+        quote(model._meta.db_table), quote(field.column), quote(model._meta.pk.column)
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            (field.get_db_prep_value(obj._created_at, connection), obj.pk) for obj in dated
+        ])
+    for obj in dated:
+        obj.created_at = obj._created_at
+
+
+def text(record, key):
+    value = record.get(key)
+    if not isinstance(value, str):
+        raise RowError(f'"{key}" must be a string')
+    return value
+
+
+def source_id(record, key):
+    """A post's id in the source stream: a number or a string, or None."""
+    value = record.get(key)
+    if value is not None and (isinstance(value, bool) or not isinstance(value, (int, str))):
+        raise RowError(f'"{key}" must be a number or a string')
+    return value
+
+
+def timestamp(record):
+    value = record.get("created_at")
+    if value is None:
+        return None
+    try:
+        parsed = parse_datetime(value) if isinstance(value, str) else None
+    except ValueError:  # well-formed but out of range, e.g. month 13
+        parsed = None
+    if parsed is None:
+        raise RowError('"created_at" must be an ISO 8601 datetime')
+    return parsed
+
+
+def message(exc):
+    if isinstance(exc, ValidationError) and hasattr(exc, "message_dict"):
+        return "; ".join(f"{field}: {' '.join(errors)}" for field, errors in exc.message_dict.items())
+    return " ".join(exc.messages) if isinstance(exc, ValidationError) else str(exc)
+
+
+def recount(post_ids):
+    """Recompute the reaction and comment counters of post_ids from their rows, bumping activity_at."""
+    if not post_ids:
+        return
+
+    def count(queryset):
+        return Coalesce(Subquery(
+            queryset.filter(post=OuterRef("pk")).order_by().values("post").annotate(n=Count("id")).values("n")
+        ), Value(0))
+
+    Post.objects.filter(pk__in=post_ids).update(
+        like_cnt=count(PostReaction.objects.filter(reaction="like")),
+        dislike_cnt=count(PostReaction.objects.filter(reaction="dislike")),
+        comments_cnt=count(Comment.objects.all()),
+        activity_at=timezone.now(),
+    )
+
+
+def recount_tags(tag_ids):
+    """Recompute Tag.post_cnt of tag_ids from their post links."""
+    if not tag_ids:
+        return
+    Tag.objects.filter(pk__in=tag_ids).update(post_cnt=Coalesce(Subquery(
+        PostTag.objects.filter(tag=OuterRef("pk")).order_by().values("tag").annotate(n=Count("id")).values("n")
+    ), Value(0)))
+
+
+def import_lines(lines, batch_size=None):
+    return Importer(batch_size).run(lines)
@@ -0,0 +1,106 @@
+"""
+Negotiated gzip/brotli response compression.
+
+CompressionMiddleware picks an encoding from POST_COMPRESSION_ENCODINGS that
+the client's Accept-Encoding allows. Among the client's highest q-values, the
+encoding listed first in the setting wins. brotli is only offered when the
+package is installed. Bodies under POST_COMPRESSION_MIN_SIZE bytes are sent
+as they are, since at that size the headers dominate and compressing costs
+more than it saves. A body that compression would not shrink is also sent
+as is. Streaming responses such as the NDJSON export are gzipped chunk by
+chunk. Like Django's GZipMiddleware, gzip output carries random padding
+against BREACH, and a strong ETag is made weak.
+"""
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+GZIP_RANDOM_BYTES = 100
+BROTLI_QUALITY = 5
+
+
+def _min_size():
+    return getattr(settings, "POST_COMPRESSION_MIN_SIZE", 1024)
+
+
+def _encodings():
+    encodings = getattr(settings, "POST_COMPRESSION_ENCODINGS", ["br", "gzip"])
+    return [e for e in encodings if e == "gzip" or (e == "br" and brotli is not None)]
+
+
+def parse_accept_encoding(header):
+    """Map each coding in an Accept-Encoding header to its q-value."""
+    accepted = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(header, encodings):
+    accepted = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(content, encoding):
+    if encoding == "br":
+        return brotli.compress(content, quality=BROTLI_QUALITY)
+    return compress_string(content, max_random_bytes=GZIP_RANDOM_BYTES)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    def process_response(self, request, response):
+        if response.has_header("Content-Encoding"):
+            return response
+        if response.streaming:
+            if response.is_async:
+                return response
+            encodings = [e for e in _encodings() if e == "gzip"]
+        elif len(response.content) < _min_size():
+            return response
+        else:
+            encodings = _encodings()
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""), encodings)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_sequence(
+                response.streaming_content, max_random_bytes=GZIP_RANDOM_BYTES
+            )
+            del response.headers["Content-Length"]
+        else:
+            compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
+        return response
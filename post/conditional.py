@@ -0,0 +1,100 @@
+"""
+HTTP conditional GET for the post API.
+
+A validator is a cheap lookup returning (last_modified, version) for the
+resource a view is about to render; the ETag hashes the version together with
+the request path and negotiated format. When the client's If-None-Match or
+If-Modified-Since still holds, a 304 is returned without running the view or
+its serializers.
+
+A post's version is its activity_at, which the detail view also keys its
+cached body on (see post.detail_cache); the wrapper leaves the version on the
+view as resource_version. Lists and tag pages share one version,
+the single PostListVersion row. send_post_changed, which runs for every create,
+delete and change to anything a list renders, bumps it in the same
+transaction as the write, so every process sees it as soon as the write is
+committed. Validating a list then costs one primary-key lookup, where an
+aggregate over the filtered posts would scan them all on every request.
+
+Validators read through post.routers like the view does, so a request served
+by a replica is validated against the replica's own versions and its ETag
+never runs ahead of the body it renders.
+"""
+import time
+from datetime import datetime
+from functools import wraps
+from hashlib import md5
+
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .models import ArchivedPost, Post, PostListVersion
+
+
+def condition(validator):
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            state = validator(self, request, *args, **kwargs)
+            self.resource_version = state and state[1]
+            if state is None:
+                # nothing to validate against (e.g. unknown object), let the view answer
+                return method(self, request, *args, **kwargs)
+
+            last_modified, version = state
+            key = f"{request.get_full_path()}|{request.accepted_renderer.format}|{version}"
+            etag = quote_etag(md5(key.encode()).hexdigest())
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = method(self, request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response["ETag"] = etag
+                if timestamp is not None:
+                    response["Last-Modified"] = http_date(timestamp)
+            return response
+        return wrapper
+    return decorator
+
+
+def posts_version():
+    """(last_modified, version) of every post list, or None before the first change."""
+    version = PostListVersion.objects.filter(pk=1).values_list("version", flat=True).first()
+    if version is None:
+        return None
+    return datetime.fromtimestamp(version / 1e9), version
+
+
+def bump_posts_version():
+    """Move posts_version() on; call in the transaction of the write."""
+    # a clock that went back must not bring an older version back
+    now = time.time_ns()
+    if not PostListVersion.objects.filter(pk=1).update(version=Greatest(F("version") + 1, Value(now))):
+        PostListVersion.objects.get_or_create(pk=1, defaults={"version": now})
+
+
+def post_list_validator(view, request, *args, **kwargs):
+    return posts_version()
+
+
+def post_validator(view, request, *args, **kwargs):
+    post_id = kwargs.get("pk", kwargs.get("post_id"))
+    try:
+        last = Post.objects.filter(pk=post_id).values_list("activity_at", flat=True).first()
+        if last is None:
+            # archived posts keep rendering, and validating, as they did when hot
+            last = ArchivedPost.objects.filter(pk=post_id).values_list("activity_at", flat=True).first()
+    except (TypeError, ValueError):
+        return None
+    if last is None:
+        return None
+    # isoformat keeps every microsecond, which a float timestamp would round off
+    return last, last.isoformat()
+
+
+def tag_validator(view, request, *args, **kwargs):
+    return posts_version()
+
@@ -0,0 +1,46 @@
+"""
+SQLite tuning.
+
+configure_sqlite runs on every new SQLite connection and applies the PRAGMAs
+in settings.SQLITE_PRAGMAS (synchronous=NORMAL, mmap and page cache sizes,
+and the WAL journal where SQLITE_JOURNAL_MODE opts in). The busy timeout
+comes from the "timeout" database option alone, so a PRAGMA cannot silently
+override it. retry_on_locked wraps write views so that a "database is locked"
+error, which WAL still raises when a reader upgrades to a writer, is retried
+with backoff instead of surfacing as a 500.
+"""
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, "SQLITE_PRAGMAS", {}).items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def is_lock_error(exc):
+    message = str(exc).lower()
+    return "database is locked" in message or "database table is locked" in message
+
+
+def retry_on_locked(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        attempts = getattr(settings, "SQLITE_LOCK_RETRIES", 3)
+        backoff = getattr(settings, "SQLITE_LOCK_BACKOFF", 0.05)
+        for attempt in range(attempts):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as exc:
+                # inside an outer transaction the whole transaction has to be retried, not us
+                if not is_lock_error(exc) or attempt == attempts - 1 or connection.in_atomic_block:
+                    raise
+                time.sleep(backoff * 2 ** attempt * (1 + random.random()))
+    return wrapper
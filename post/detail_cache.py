@@ -0,0 +1,72 @@
+"""
+Per-post cache of the serialized PostSerializer detail body.
+
+Entries are keyed on the post's activity_at, which the conditional-GET
+validator has already read from the database the request renders from. A
+change moves activity_at, so the next read misses in every process without
+any invalidation message, and stale bodies simply age out. A replica-served
+request is keyed on the replica's activity_at, so it only ever shares entries
+with requests that saw the same version. On a miss a short lock in the cache
+lets exactly one request rebuild the entry while the others wait for it (or
+give up after POST_DETAIL_CACHE_LOCK_WAIT and render themselves).
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "waits": 0}
+
+
+def _cache():
+    return caches[getattr(settings, "POST_DETAIL_CACHE", "default")]
+
+
+def _timeout():
+    return getattr(settings, "POST_DETAIL_CACHE_TIMEOUT", 300)
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def get_or_build(post_id, version, variant, build):
+    """
+    Return the cached body for post_id at version (its activity_at), calling
+    build() on a miss. variant separates renderings that differ per request
+    (e.g. absolute image URLs).
+    """
+    cache = _cache()
+    key = f"post:detail:{post_id}:{version}:{variant}"
+    data = cache.get(key)
+    if data is not None:
+        _count("hits")
+        return data
+
+    _count("misses")
+    lock_key = f"{key}:lock"
+    wait = getattr(settings, "POST_DETAIL_CACHE_LOCK_WAIT", 0.5)
+    if not cache.add(lock_key, 1, max(1, int(wait * 4))):
+        _count("waits")
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            time.sleep(0.02)
+            data = cache.get(key)
+            if data is not None:
+                return data
+        return build()
+
+    try:
+        data = build()
+        cache.set(key, data, _timeout())
+        return data
+    finally:
+        cache.delete(lock_key)
@@ -0,0 +1,131 @@
+"""
+Per-user feed of the posts carrying the tags a user follows.
+
+Fan-out on write: whenever a post's tags are set (PostViewSet.handle_tags,
+bulk import), fan_out makes its FeedEntry rows match the followers of those
+tags. Reading a feed page is then one range read on feed_user_created_idx.
+
+Tags with POST_FEED_FANOUT_LIMIT followers or more are not fanned out, since
+every post would cost that many rows. page() reads those tags' latest posts
+at request time instead and merges them into the user's entries (fan-out on
+read). Posts a tag got while it was over the limit are not copied into feeds
+if it later drops back below.
+
+Following a tag copies its POST_FEED_BACKFILL latest posts into the feed.
+Unfollowing removes the entries that no other followed tag accounts for.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import FeedEntry, Post, Tag, TagFollow
+from .paginations import KeysetPagination
+from .serializers import PostListProjection
+
+
+def _fanout_limit():
+    return getattr(settings, "POST_FEED_FANOUT_LIMIT", 1000)
+
+
+def _backfill():
+    return getattr(settings, "POST_FEED_BACKFILL", 50)
+
+
+def fan_out(posts, new=False):
+    """
+    Make the feed entries of posts (instances with id and created_at) match
+    their tags' followers; new=True skips looking for entries to remove.
+    """
+    posts = {post.id: post for post in posts}
+    if not posts:
+        return
+    wanted = set(
+        TagFollow.objects.filter(tag__post__in=posts, tag__follower_cnt__lt=_fanout_limit())
+        .values_list("user_id", "tag__post")
+    )
+    existing = set()
+    if not new:
+        existing = set(FeedEntry.objects.filter(post__in=posts).values_list("user_id", "post_id"))
+
+    stale = defaultdict(list)
+    for user_id, post_id in existing - wanted:
+        stale[post_id].append(user_id)
+    for post_id, user_ids in stale.items():
+        FeedEntry.objects.filter(post_id=post_id, user_id__in=user_ids).delete()
+    missing = wanted - existing
+    if missing:
+        FeedEntry.objects.bulk_create(
+            [FeedEntry(user_id=user_id, post_id=post_id, created_at=posts[post_id].created_at)
+             for user_id, post_id in missing],
+            ignore_conflicts=True, batch_size=1000,
+        )
+
+
+def follow(user, tag):
+    """Follow tag and copy its latest posts into user's feed; False if already following."""
+    with transaction.atomic():
+        _, created = TagFollow.objects.get_or_create(user=user, tag=tag)
+        if not created:
+            return False
+        Tag.objects.filter(pk=tag.pk).update(follower_cnt=F("follower_cnt") + 1)
+        tag.refresh_from_db(fields=["follower_cnt"])
+        if tag.follower_cnt < _fanout_limit():
+            latest = Post.objects.filter(tag=tag).order_by("-created_at", "-id").values_list("id", "created_at")
+            FeedEntry.objects.bulk_create(
+                [FeedEntry(user=user, post_id=post_id, created_at=created_at)
+                 for post_id, created_at in latest[:_backfill()]],
+                ignore_conflicts=True,
+            )
+    return True
+
+
+def unfollow(user, tag):
+    """Stop following tag and drop the entries it alone put in user's feed; False if not following."""
+    with transaction.atomic():
+        if not TagFollow.objects.filter(user=user, tag=tag).delete()[0]:
+            return False
+        Tag.objects.filter(pk=tag.pk).update(follower_cnt=F("follower_cnt") - 1)
+        tag.refresh_from_db(fields=["follower_cnt"])
+        still_followed = Post.tag.through.objects.filter(
+            tag__follows__user=user, tag__follower_cnt__lt=_fanout_limit()
+        ).values("post_id")
+        FeedEntry.objects.filter(user=user, post__tag=tag).exclude(post_id__in=still_followed).delete()
+    return True
+
+
+def page(user, keys, position, limit):
+    """
+    Up to limit rows of user's feed, as PostListProjection.project dicts, in
+    keys order (["-created_at", "-id"] or its flip) after position.
+    """
+    entry_keys = [keys[0], "-post_id" if keys[1].startswith("-") else "post_id"]
+    entries = FeedEntry.objects.filter(user=user).order_by(*entry_keys)
+    if position is not None:
+        entries = entries.filter(KeysetPagination.after(entry_keys, position))
+    candidates = list(entries.values_list("created_at", "post_id")[:limit])
+
+    popular = list(Tag.objects.filter(follows__user=user, follower_cnt__gte=_fanout_limit()).values_list("id", flat=True))
+    if popular:
+        posts = Post.objects.filter(
+            pk__in=Post.tag.through.objects.filter(tag_id__in=popular).values("post_id")
+        ).order_by(*keys)
+        if position is not None:
+            posts = posts.filter(KeysetPagination.after(keys, position))
+        candidates = set(candidates) | set(posts.values_list("created_at", "id")[:limit])
+        candidates = sorted(candidates, reverse=keys[0].startswith("-"))[:limit]
+
+    ids = [post_id for _, post_id in candidates]
+    rows = {row["id"]: row for row in PostListProjection.project(Post.objects.filter(pk__in=ids))}
+    return [rows[post_id] for post_id in ids if post_id in rows]
+
+
+class FeedPagination(KeysetPagination):
+    """Keyset pages of page(), newest first, with the same cursors as PostCursorPagination."""
+    ordering_fields = ['created_at']
+
+    def paginate_feed(self, user, request):
+        keys = self.start(request, Post)
+        position = self.cursor['position'] if self.cursor is not None else None
+        return self.set_page(page(user, keys, position, self.page_size + 1))
@@ -0,0 +1,114 @@
+"""
+Post image storage and resized variants.
+
+Uploads are hashed while streaming through their chunks and stored under
+images/<sha256[:2]>/<sha256><ext>, so the same picture uploaded twice is kept
+once. Resized copies (original format and WebP) are produced in a thread pool
+after the request commits and recorded in Post.image_variants, which the list
+serializers turn into thumbnail URLs.
+"""
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def variant_sizes():
+    return getattr(settings, "POST_IMAGE_VARIANTS", {"thumbnail": 320})
+
+
+def store_upload(upload):
+    """Save an UploadedFile under its content hash and return the storage name."""
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+
+    ext = os.path.splitext(upload.name)[1].lower()
+    name = f"images/{digest.hexdigest()[:2]}/{digest.hexdigest()}{ext}"
+    if not default_storage.exists(name):
+        # Storage.save streams the file chunk by chunk
+        name = default_storage.save(name, upload)
+    return name
+
+
+def schedule_variants(name):
+    """Build the variants of a stored image once the current transaction commits."""
+    if getattr(settings, "POST_IMAGE_SYNC", False):
+        transaction.on_commit(lambda: build_variants(name))
+    else:
+        transaction.on_commit(lambda: _pool().submit(_run_in_worker, name))
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "POST_IMAGE_WORKERS", 2), thread_name_prefix="post-images"
+        )
+    return _executor
+
+
+def _run_in_worker(name):
+    try:
+        build_variants(name)
+    except Exception:
+        logger.exception("building variants of %s failed", name)
+    finally:
+        close_old_connections()
+
+
+def build_variants(name):
+    from PIL import Image
+
+    from . import leaderboard
+    from .signals import send_post_changed
+
+    stem = os.path.splitext(name)[0]
+    variants = {}
+    with default_storage.open(name) as f:
+        original = Image.open(f)
+        original.load()
+
+    for label, size in variant_sizes().items():
+        image = original.copy()
+        image.thumbnail((size, size))
+        for suffix, fmt in ((os.path.splitext(name)[1], original.format), (".webp", "WEBP")):
+            key = label if fmt != "WEBP" else f"{label}_webp"
+            variant_name = f"{stem}_{size}{suffix}"
+            if not default_storage.exists(variant_name):
+                buffer = BytesIO()
+                storable(image, fmt).save(buffer, format=fmt)
+                variant_name = default_storage.save(variant_name, ContentFile(buffer.getvalue()))
+            variants[key] = variant_name
+
+    post_ids = list(Post.objects.filter(image=name).values_list("id", flat=True))
+    # the thumbnails are part of the rendered post: move its validators and caches on
+    Post.objects.filter(id__in=post_ids).update(image_variants=variants, activity_at=timezone.now())
+    send_post_changed(Post, post_ids)
+    # a board built before the variants existed would list them without a thumbnail
+    for post_id in post_ids:
+        leaderboard.update(post_id)
+    return variants
+
+
+def storable(image, fmt):
+    """image in a mode fmt can save; WebP keeps the transparency JPEG cannot."""
+    if fmt == "JPEG" and image.mode not in ("RGB", "L"):
+        return image.convert("RGB")
+    if fmt == "WEBP" and image.mode not in ("RGB", "RGBA"):
+        return image.convert("RGBA" if image.has_transparency_data else "RGB")
+    return image
@@ -0,0 +1,141 @@
+"""
+Cached top-N post leaderboards backing PostViewSet.recommend and top5.
+
+There is one ranking per entry of RANKINGS: top5 ranks by likes, recommend
+by the hot score from post.scoring. Each ranking and time window keeps a
+small sorted board in the cache configured by LEADERBOARD_CACHE. Reaction and comment changes patch the affected post's
+entry in place instead of re-sorting the posts table; a board is only rebuilt
+when it is missing, when an entry ages out of its window, or when a post that
+was on a full board drops to the bottom (a post outside the board might now
+outrank it).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from .models import Post
+from .routers import reads_from_replica
+from .serializers import PostListProjection
+
+WINDOWS = {
+    "24h": timedelta(hours=24),
+    "7d": timedelta(days=7),
+    "all": None,
+}
+DEFAULT_WINDOW = "all"
+# ranking -> indexed Post column it sorts by
+RANKINGS = {
+    "likes": "like_cnt",
+    "hot": "hot_score",
+}
+
+
+def _cache():
+    return caches[getattr(settings, "LEADERBOARD_CACHE", "default")]
+
+
+def _size():
+    return getattr(settings, "LEADERBOARD_SIZE", 10)
+
+
+def _timeout():
+    return getattr(settings, "LEADERBOARD_TIMEOUT", 300)
+
+
+def _key(window, ranking):
+    return f"post:leaderboard:{ranking}:{window}"
+
+
+def _cutoff(window):
+    if WINDOWS[window] is None:
+        return None
+    return (timezone.now() - WINDOWS[window]).timestamp()
+
+
+def _sort_key(entry):
+    return (-entry["score"], -entry["id"])
+
+
+def _project(queryset):
+    return PostListProjection.project(queryset, "hot_score")
+
+
+def _entries(rows, ranking):
+    # rows come from _project
+    return [
+        {
+            "id": row["id"],
+            "score": row[RANKINGS[ranking]],
+            "created_at": row["created_at"].timestamp(),
+            "data": data,
+        }
+        for row, data in zip(rows, PostListProjection().data(rows))
+    ]
+
+
+def _build(window, ranking):
+    queryset = Post.objects.order_by(f"-{RANKINGS[ranking]}", "-id")
+    if WINDOWS[window] is not None:
+        queryset = queryset.filter(created_at__gte=timezone.now() - WINDOWS[window])
+    rows = list(_project(queryset)[:_size() + 1])
+    board = {
+        "entries": _entries(rows[:_size()], ranking),
+        "full": len(rows) > _size(),
+    }
+    if not reads_from_replica():
+        _cache().set(_key(window, ranking), board, _timeout())
+    return board
+
+
+def get_top(window, limit, ranking="likes"):
+    board = _cache().get(_key(window, ranking))
+    cutoff = _cutoff(window)
+    if board is None or (
+        cutoff is not None and any(e["created_at"] < cutoff for e in board["entries"])
+    ):
+        board = _build(window, ranking)
+    return [entry["data"] for entry in board["entries"][:limit]]
+
+
+def update(post_id):
+    """Patch post_id's entry on every cached board after its counters changed."""
+    boards = _cache().get_many([_key(window, ranking) for ranking in RANKINGS for window in WINDOWS])
+    if not boards:
+        # nothing cached to patch, so no need to read the post
+        return
+    post = _project(Post.objects.filter(pk=post_id)).first()
+    entry = _entries([post], "likes")[0] if post is not None else None
+    for ranking, field in RANKINGS.items():
+        if entry is not None:
+            entry = {**entry, "score": post[field]}
+        for window in WINDOWS:
+            board = boards.get(_key(window, ranking))
+            if board is not None:
+                _patch(window, ranking, board, post_id, entry)
+
+
+def _patch(window, ranking, board, post_id, entry):
+    entries = [e for e in board["entries"] if e["id"] != post_id]
+    was_listed = len(entries) != len(board["entries"])
+    cutoff = _cutoff(window)
+    if entry is not None and (cutoff is None or entry["created_at"] >= cutoff):
+        if was_listed or not board["full"] or _sort_key(entry) < _sort_key(entries[-1]):
+            entries.append(entry)
+            entries.sort(key=_sort_key)
+
+    if was_listed and board["full"] and (
+        len(entries) < _size() or entries[-1]["id"] == post_id
+    ):
+        # the post fell to the bottom of a board that had more candidates
+        _cache().delete(_key(window, ranking))
+        return
+
+    full = board["full"] or len(entries) > _size()
+    _cache().set(_key(window, ranking), {"entries": entries[:_size()], "full": full}, _timeout())
+
+
+def invalidate(window=None):
+    windows = [window] if window else WINDOWS
+    _cache().delete_many([_key(w, ranking) for w in windows for ranking in RANKINGS])
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from post.archive import archive, candidates, default_cutoff
+from post.models import Comment, PostReaction
+
+
+class Command(BaseCommand):
+    help = "Move posts older than POST_ARCHIVE_AFTER_DAYS, with their comments and reactions, to the archive tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, help="archive posts created and last active this many days ago")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["days"] is not None:
+            cutoff = timezone.now() - timedelta(days=options["days"])
+        else:
+            cutoff = default_cutoff()
+
+        if options["dry_run"]:
+            posts = candidates(cutoff)
+            moved = {
+                "posts": posts.count(),
+                "comments": Comment.objects.filter(post__in=posts).count(),
+                "reactions": PostReaction.objects.filter(post__in=posts).count(),
+            }
+        else:
+            moved = archive(cutoff, options["batch_size"])
+
+        self.stdout.write(
+            f"{moved['posts']} post(s), {moved['comments']} comment(s) and {moved['reactions']} reaction(s) "
+            f"from before {cutoff:%Y-%m-%d %H:%M}" + (" to archive (dry run)" if options["dry_run"] else " archived")
+        )
@@ -0,0 +1,137 @@
+import json
+import platform
+import random
+import time
+from datetime import datetime
+
+import django
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from post.bench import WORDS, percentile, seed_dataset, temporary_database, zipf_weights
+from post.models import Post
+
+
+class Command(BaseCommand):
+    help = "Seed a throwaway database and benchmark the post API endpoints, reporting JSON"
+
+    SCENARIOS = ["list", "detail", "search", "order_by_like", "recommend", "top5", "likes", "comments"]
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=5_000)
+        parser.add_argument("--users", type=int, default=500)
+        parser.add_argument("--comments", type=int, default=20_000)
+        parser.add_argument("--reactions", type=int, default=40_000)
+        parser.add_argument("--zipf", type=float, default=1.1)
+        parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+        parser.add_argument("--warmup", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--scenario", choices=self.SCENARIOS, nargs="+", default=self.SCENARIOS)
+        parser.add_argument("--output", help="also write the report to this file")
+        parser.add_argument("--baseline", help="earlier report to compare latencies against")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        # the write scenarios send far more requests per client than the throttles allow
+        with override_settings(POST_THROTTLE_RATES={}), temporary_database():
+            dataset = seed_dataset(
+                rng, options["posts"], options["users"], options["comments"], options["reactions"], options["zipf"]
+            )
+            self.post_ids = list(Post.objects.order_by("pk").values_list("pk", flat=True))
+            self.weights = zipf_weights(len(self.post_ids), options["zipf"])
+            self.users = list(User.objects.filter(username__startswith="seed"))
+            scenarios = {}
+            for name in options["scenario"]:
+                cache.clear()
+                scenarios[name] = self.run(name, rng, options["requests"], options["warmup"])
+
+        report = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "options": {key: options[key] for key in ["posts", "users", "comments", "reactions", "zipf", "requests", "seed"]},
+            "dataset": dataset,
+            "scenarios": scenarios,
+        }
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                report["change"] = self.compare(json.load(f)["scenarios"], scenarios)
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        self.stdout.write(output)
+
+    def hot_post(self, rng):
+        return rng.choices(self.post_ids, cum_weights=self.weights)[0]
+
+    def request(self, name, client, rng):
+        if name == "list":
+            return client.get("/posts", {"page": rng.randint(1, 20)})
+        if name == "detail":
+            return client.get(f"/posts/{self.hot_post(rng)}")
+        if name == "search":
+            return client.get("/posts", {"search": rng.choice(WORDS)})
+        if name == "order_by_like":
+            return client.get("/posts", {"ordering": "-like_cnt", "page": rng.randint(1, 5)})
+        if name == "recommend":
+            return client.get("/posts/recommend")
+        if name == "top5":
+            return client.get("/posts/top5")
+        user = rng.choice(self.users)
+        client.force_authenticate(user)
+        if name == "likes":
+            return client.post(f"/posts/{self.hot_post(rng)}/likes")
+        return client.post(
+            f"/posts/{self.hot_post(rng)}/comments", {"content": " ".join(rng.choices(WORDS, k=8)), "writer": user.id}
+        )
+
+    def run(self, name, rng, requests, warmup):
+        client = APIClient()
+        for _ in range(warmup):
+            self.request(name, client, rng)
+
+        latencies, queries, errors = [], [], 0
+        count = [0]
+
+        def counter(execute, sql, params, many, context):
+            count[0] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            for _ in range(requests):
+                count[0] = 0
+                start = time.perf_counter()
+                response = self.request(name, client, rng)
+                latencies.append((time.perf_counter() - start) * 1000)
+                queries.append(count[0])
+                errors += response.status_code >= 400
+            elapsed = time.perf_counter() - started
+        return {
+            "requests": requests,
+            "rps": round(requests / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "queries_mean": round(sum(queries) / requests, 2),
+            "queries_max": max(queries),
+            "errors": errors,
+        }
+
+    def compare(self, baseline, scenarios):
+        change = {}
+        for name, result in scenarios.items():
+            if name not in baseline:
+                continue
+            change[name] = {
+                key: f"{(result[key] - baseline[name][key]) / baseline[name][key] * 100:+.1f}%"
+                for key in ["rps", "p50_ms", "p95_ms", "p99_ms", "queries_mean"]
+                if baseline[name].get(key)
+            }
+        return change
@@ -0,0 +1,93 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+
+from post.bench import percentile, temporary_database
+from post.models import Comment, Post, Tag
+
+
+class Command(BaseCommand):
+    help = "Load-test the /async read endpoints (ASGI) against their DRF (WSGI) counterparts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--requests", type=int, default=400, help="requests per endpoint and path")
+
+    def handle(self, *args, **options):
+        with temporary_database():
+            user, post_id = self.seed(options["posts"])
+            paths = {
+                "list": "/posts?page=3",
+                "detail": f"/posts/{post_id}",
+                "comments": f"/posts/{post_id}/comments",
+                "tag": "/tags/bench",
+                "recommend": "/posts/recommend",
+            }
+            results = {}
+            for name, path in paths.items():
+                results[name] = {
+                    "wsgi": self.run_sync(user, path, options),
+                    "asgi": asyncio.run(self.run_async(user, "/async" + path, options)),
+                }
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def seed(self, count):
+        user = User.objects.create_user(username="bench")
+        tag = Tag.objects.create(name="bench", post_cnt=count)
+        Post.objects.bulk_create(
+            [Post(title=f"post {i}", writer="bench", content="#bench", like_cnt=i % 50) for i in range(count)]
+        )
+        posts = list(Post.objects.values_list("id", "created_at"))
+        Post.tag.through.objects.bulk_create(
+            [Post.tag.through(post_id=pk, tag=tag, created_at=created_at) for pk, created_at in posts]
+        )
+        post_ids = [pk for pk, _ in posts]
+        Comment.objects.bulk_create([Comment(post_id=post_ids[0], writer=user, content="hi") for _ in range(50)])
+        return user, post_ids[0]
+
+    def report(self, latencies, elapsed):
+        return {
+            "rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+        }
+
+    def run_sync(self, user, path, options):
+        def worker(n):
+            client = Client()
+            client.force_login(user)
+            latencies = []
+            for _ in range(n):
+                start = time.perf_counter()
+                client.get(path)
+                latencies.append((time.perf_counter() - start) * 1000)
+            return latencies
+
+        per_worker = options["requests"] // options["concurrency"]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options["concurrency"]) as pool:
+            chunks = list(pool.map(worker, [per_worker] * options["concurrency"]))
+        return self.report([ms for chunk in chunks for ms in chunk], time.perf_counter() - start)
+
+    async def run_async(self, user, path, options):
+        client = AsyncClient()
+        await asyncio.to_thread(client.force_login, user)
+
+        async def worker(n):
+            latencies = []
+            for _ in range(n):
+                start = time.perf_counter()
+                await client.get(path)
+                latencies.append((time.perf_counter() - start) * 1000)
+            return latencies
+
+        per_worker = options["requests"] // options["concurrency"]
+        start = time.perf_counter()
+        chunks = await asyncio.gather(*[worker(per_worker) for _ in range(options["concurrency"])])
+        return self.report([ms for chunk in chunks for ms in chunk], time.perf_counter() - start)
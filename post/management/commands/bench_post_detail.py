@@ -0,0 +1,54 @@
+import json
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIClient
+
+from post.bench import measure, temporary_database
+from post.models import Comment, Post
+from post.serializers import CommentSerializer
+
+
+class Command(BaseCommand):
+    help = "Measure GET /posts/{id} latency, memory and size as a post's comment count grows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--comments", type=int, nargs="+", default=[10, 100, 1000, 10000])
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        results = []
+        with temporary_database():
+            user = User.objects.create_user(username="bench")
+            client = APIClient()
+            for count in options["comments"]:
+                post = Post.objects.create(title="bench", writer="bench", content="bench")
+                Comment.objects.bulk_create(
+                    [Comment(post=post, writer=user, content="comment " * 10) for _ in range(count)],
+                    batch_size=2000,
+                )
+                Post.objects.filter(pk=post.pk).update(comments_cnt=count)
+
+                def detail():
+                    cache.clear()  # measure the cold (uncached) render
+                    return client.get(f"/posts/{post.id}")
+
+                def embed_all():
+                    # what the detail view used to do: every comment, one post fetch each
+                    return CommentSerializer(Comment.objects.filter(post=post), many=True).data
+
+                tracemalloc.start()
+                response = detail()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                results.append({
+                    "comments": count,
+                    "bytes": len(response.content),
+                    "peak_kb": round(peak / 1024, 1),
+                    "detail": measure(detail, options["repeat"]),
+                    "embed_all_comments": measure(embed_all, max(1, options["repeat"] // 4)),
+                })
+        self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,53 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from post.bench import measure, seed_dataset, temporary_database
+from post.models import Post
+from post.serializers import PostListProjection, PostListSerializer
+
+
+class Command(BaseCommand):
+    help = "Compare PostListSerializer with the values() projection used by the post list"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=5_000)
+        parser.add_argument("--rows", type=int, nargs="+", default=[10, 100, 1000])
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        results = []
+        with temporary_database():
+            seed_dataset(random.Random(options["seed"]), options["posts"], 100, 0, 0)
+            # half the posts carry an image with a thumbnail, so URL building is measured too
+            Post.objects.annotate(odd=F("id") % 2).filter(odd=1).update(
+                image="images/ab/abcdef.png", image_variants={"thumbnail": "images/ab/abcdef_320.png"},
+            )
+            context = {"request": Request(APIRequestFactory().get("/posts"))}
+            renderer = JSONRenderer()
+            queryset = Post.objects.prefetch_related("tag").order_by("-created_at", "-id")
+
+            for rows in options["rows"]:
+                def serializer():
+                    posts = list(queryset[:rows])
+                    return renderer.render(PostListSerializer(posts, many=True, context=context).data)
+
+                def projection():
+                    page = list(PostListProjection.project(queryset)[:rows])
+                    return renderer.render(PostListProjection(context).data(page))
+
+                assert serializer() == projection()
+                old, new = measure(serializer, options["repeat"]), measure(projection, options["repeat"])
+                results.append({
+                    "rows": rows,
+                    "serializer": old,
+                    "projection": new,
+                    "speedup": round(old["p50_ms"] / new["p50_ms"], 2),
+                })
+        self.stdout.write(json.dumps(results, indent=2))
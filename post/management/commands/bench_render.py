@@ -0,0 +1,66 @@
+import json
+import random
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from post.bench import measure, seed_dataset, temporary_database
+from post.compression import compress
+from post.models import Post, Tag
+from post.renderers import ORJSONRenderer
+
+
+class Command(BaseCommand):
+    help = "Compare JSONRenderer with ORJSONRenderer and report the compressed size of list, detail and tag pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=2_000)
+        parser.add_argument("--comments", type=int, default=20_000)
+        parser.add_argument("--repeat", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        results = {}
+        with temporary_database():
+            seed_dataset(random.Random(options["seed"]), options["posts"], 100, options["comments"], 0)
+            busiest = Post.objects.order_by("-comments_cnt", "-id").values_list("pk", flat=True).first()
+            tag = Tag.objects.order_by("-post_cnt", "-id").values_list("name", flat=True).first()
+            pages = {
+                "list": "/posts?page_size=10",
+                "detail": f"/posts/{busiest}",
+                "tag": f"/tags/{tag}?page_size=10",
+            }
+            client = APIClient()
+            for name, url in pages.items():
+                cache.clear()
+                results[name] = self.run(client, url, options["repeat"])
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run(self, client, url, repeat):
+        data = client.get(url).data
+        stdlib, fast = JSONRenderer(), ORJSONRenderer()
+        body = stdlib.render(data)
+        assert fast.render(data) == body
+        json_time = measure(lambda: stdlib.render(data), repeat)
+        orjson_time = measure(lambda: fast.render(data), repeat)
+
+        wire = {"identity": len(client.get(url, HTTP_ACCEPT_ENCODING="identity").content)}
+        compress_time = {}
+        for encoding in ["gzip", "br"]:
+            response = client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+            if response.get("Content-Encoding") != encoding:
+                continue  # not installed, or the body is under POST_COMPRESSION_MIN_SIZE
+            wire[encoding] = len(response.content)
+            compress_time[encoding] = measure(lambda: compress(body, encoding), repeat)
+        return {
+            "url": url,
+            "render": {
+                "json": json_time,
+                "orjson": orjson_time,
+                "speedup": round(json_time["p50_ms"] / orjson_time["p50_ms"], 2),
+            },
+            "bytes": wire,
+            "compress": compress_time,
+        }
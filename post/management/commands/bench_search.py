@@ -0,0 +1,69 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand
+from rest_framework.filters import SearchFilter
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from post.bench import WORDS, measure, temporary_database
+from post.models import Post, Tag
+from post.search import PostSearchFilter
+
+
+class LegacySearchView:
+    search_fields = ["title", "writer", "=tag__name"]
+
+
+class Command(BaseCommand):
+    help = "Compare ?search= latency of the old SearchFilter and PostSearchFilter"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=100_000)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        with temporary_database():
+            self.seed(rng, options["posts"])
+            factory = APIRequestFactory()
+            results = {}
+            for query in ["django", "coffee travel", "python", "zzz"]:
+                request = Request(factory.get("/posts", {"search": query}))
+                legacy = lambda: self.page(
+                    SearchFilter().filter_queryset(request, Post.objects.all(), LegacySearchView())
+                )
+                indexed = lambda: self.page(
+                    PostSearchFilter().filter_queryset(request, Post.objects.all(), None)
+                )
+                results[query] = {
+                    "search_filter": measure(legacy, options["repeat"]),
+                    "post_search_filter": measure(indexed, options["repeat"]),
+                }
+        self.stdout.write(json.dumps({"posts": options["posts"], "queries": results}, indent=2))
+
+    def page(self, queryset):
+        # what a page-number list request does: COUNT(*) plus the first page
+        queryset.count()
+        list(queryset[:5])
+
+    def seed(self, rng, count):
+        tags = Tag.objects.bulk_create([Tag(name=word) for word in WORDS])
+        batch = []
+        for i in range(count):
+            words = rng.choices(WORDS, k=12)
+            batch.append(Post(
+                title=" ".join(words[:3]), writer=f"writer{i % 500}", content=" ".join(words),
+            ))
+            if len(batch) == 5000:
+                Post.objects.bulk_create(batch)
+                batch = []
+        Post.objects.bulk_create(batch)
+
+        through = Post.tag.through
+        posts = list(Post.objects.values_list("id", "created_at"))
+        through.objects.bulk_create(
+            [through(post_id=pk, tag_id=rng.choice(tags).id, created_at=created_at) for pk, created_at in posts],
+            batch_size=5000,
+        )
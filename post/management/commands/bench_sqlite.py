@@ -0,0 +1,91 @@
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+
+from post.bench import percentile, temporary_database
+from post.models import Post
+
+
+class Command(BaseCommand):
+    help = "Mixed read/write load on the post endpoints with and without the SQLite tuning"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=500)
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=4)
+        parser.add_argument("--seconds", type=float, default=5)
+
+    def handle(self, *args, **options):
+        untuned = {"SQLITE_PRAGMAS": {}, "SQLITE_LOCK_RETRIES": 1}
+        results = {
+            "untuned": self.run(options, untuned, conn_max_age=0, timeout=0.1),
+            "tuned": self.run(options, {}, conn_max_age=None, timeout=None),
+        }
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run(self, options, overrides, conn_max_age, timeout):
+        saved = {key: connection.settings_dict.get(key) for key in ("CONN_MAX_AGE", "OPTIONS")}
+        if conn_max_age is not None:
+            connection.settings_dict["CONN_MAX_AGE"] = conn_max_age
+        if timeout is not None:
+            connection.settings_dict["OPTIONS"] = {**saved["OPTIONS"], "timeout": timeout}
+        try:
+            # throttled writes would skip the database and hide the lock contention measured here
+            with override_settings(POST_THROTTLE_RATES={}, **overrides), temporary_database():
+                return self.load(options)
+        finally:
+            connection.settings_dict.update(saved)
+
+    def load(self, options):
+        users = [User.objects.create_user(username=f"bench{i}") for i in range(options["writers"])]
+        Post.objects.bulk_create(
+            [Post(title=f"post {i}", writer="bench", content="bench") for i in range(options["posts"])]
+        )
+        post_ids = list(Post.objects.values_list("id", flat=True))
+        jobs = [("read", Client(raise_request_exception=False), None) for _ in range(options["readers"])]
+        for user in users:
+            client = Client(raise_request_exception=False)
+            client.force_login(user)
+            jobs.append(("write", client, user.id))
+        connection.close()  # the workers open their own connections
+        deadline = time.monotonic() + options["seconds"]
+
+        def worker(kind, client, user_id):
+            rng = random.Random()
+            stats = {"latencies": [], "errors": 0}
+            while time.monotonic() < deadline:
+                post_id = rng.choice(post_ids)
+                start = time.perf_counter()
+                if kind == "read":
+                    response = client.get(rng.choice(["/posts", f"/posts/{post_id}"]))
+                elif rng.random() < 0.7:
+                    response = client.post(f"/posts/{post_id}/likes")
+                else:
+                    response = client.post(
+                        f"/posts/{post_id}/comments", {"content": "bench", "writer": user_id}
+                    )
+                stats["latencies"].append((time.perf_counter() - start) * 1000)
+                stats["errors"] += response.status_code >= 500
+            connection.close()
+            return kind, stats
+
+        with ThreadPoolExecutor(len(jobs)) as pool:
+            outcomes = list(pool.map(lambda job: worker(*job), jobs))
+
+        report = {}
+        for kind in ("read", "write"):
+            latencies = [ms for k, s in outcomes if k == kind for ms in s["latencies"]]
+            report[kind] = {
+                "requests": len(latencies),
+                "rps": round(len(latencies) / options["seconds"], 1),
+                "errors": sum(s["errors"] for k, s in outcomes if k == kind),
+                "p50_ms": round(percentile(latencies, 50), 3) if latencies else None,
+                "p99_ms": round(percentile(latencies, 99), 3) if latencies else None,
+            }
+        return report
@@ -0,0 +1,71 @@
+import json
+import random
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework.throttling import UserRateThrottle
+
+from post.bench import measure, seed_dataset, temporary_database
+from post.models import Post
+from post.throttles import SlidingWindowThrottle
+
+# high enough that nothing is throttled: the benchmark measures the bookkeeping
+UNLIMITED = {"reaction": {"user": "1000000/min", "ip": "1000000/min"}}
+
+
+class HistoryThrottle(UserRateThrottle):
+    # DRF's timestamp-list throttle, for comparison
+    rate = "1000000/min"
+
+
+class View:
+    action = "likes"
+    throttle_scopes = {"likes": "reaction"}
+
+
+class Command(BaseCommand):
+    help = "Measure what the write throttles add to a request, per check and end to end on /posts/{id}/likes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--checks", type=int, default=5_000, help="throttle checks per client")
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        with override_settings(POST_THROTTLE_RATES=UNLIMITED):
+            report = {"check": self.checks(options["checks"])}
+            with temporary_database():
+                seed_dataset(random.Random(options["seed"]), 200, 50, 0, 0)
+                report["likes"] = self.requests(options["requests"], random.Random(options["seed"]))
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def checks(self, repeat):
+        django_request = APIRequestFactory().post("/posts/1/likes")
+        force_authenticate(django_request, User(pk=1, username="bench"))
+        request = Request(django_request)
+        view = View()
+        results = {}
+        for name, throttle in [("sliding_window", SlidingWindowThrottle()), ("drf_history", HistoryThrottle())]:
+            cache.clear()
+            results[name] = measure(lambda: throttle.allow_request(request, view), repeat)
+        return results
+
+    def requests(self, repeat, rng):
+        post_ids = list(Post.objects.values_list("pk", flat=True))
+        client = APIClient()
+        client.force_authenticate(User.objects.filter(username__startswith="seed").first())
+
+        def like():
+            client.post(f"/posts/{rng.choice(post_ids)}/likes")
+
+        results = {}
+        for name, rates in [("unthrottled", {}), ("throttled", UNLIMITED)]:
+            cache.clear()
+            with override_settings(POST_THROTTLE_RATES=rates):
+                results[name] = measure(like, repeat, warmup=20)
+        results["overhead_p50_ms"] = round(results["throttled"]["p50_ms"] - results["unthrottled"]["p50_ms"], 3)
+        return results
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from post.images import build_variants
+from post.models import Post
+
+
+class Command(BaseCommand):
+    help = "Build missing thumbnail/WebP variants for posts that have an image"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="rebuild posts that already have variants")
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image="").exclude(image__isnull=True)
+        if not options["all"]:
+            posts = posts.filter(image_variants={})
+        names = posts.order_by().values_list("image", flat=True).distinct()
+
+        done = 0
+        for name in names.iterator():
+            try:
+                build_variants(name)
+                done += 1
+            except (OSError, ValueError) as exc:
+                self.stderr.write(f"{name}: {exc}")
+        self.stdout.write(f"built variants for {done} image(s)")
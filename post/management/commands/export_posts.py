@@ -0,0 +1,24 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from post.bulk import export_lines
+
+
+class Command(BaseCommand):
+    help = "Write all posts, comments and reactions as NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", help="file to write, stdout when omitted")
+        parser.add_argument("--chunk-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        out = open(options["output"], "wb") if options["output"] else sys.stdout.buffer
+        try:
+            for line in export_lines(options["chunk_size"]):
+                out.write(line)
+        finally:
+            if options["output"]:
+                out.close()
+            else:
+                out.flush()
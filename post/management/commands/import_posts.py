@@ -0,0 +1,22 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+
+from post.bulk import import_lines
+
+
+class Command(BaseCommand):
+    help = "Import posts, comments and reactions from NDJSON (see post.bulk for the format)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="NDJSON file, or - for stdin")
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        if options["path"] == "-":
+            report = import_lines(sys.stdin.buffer, options["batch_size"])
+        else:
+            with open(options["path"], "rb") as lines:
+                report = import_lines(lines, options["batch_size"])
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
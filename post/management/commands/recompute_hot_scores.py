@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from post import leaderboard
+from post.models import Post
+from post.scoring import parameters, score_of
+
+
+class Command(BaseCommand):
+    help = "Recompute Post.hot_score for every post, e.g. after changing POST_HOT_SCORE"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        params = parameters()
+        posts = Post.objects.order_by("pk").only("like_cnt", "dislike_cnt", "comments_cnt", "created_at", "hot_score")
+
+        # written every batch_size changed posts, so memory stays flat when
+        # new weights change every score
+        changed = []
+        rescored = total = 0
+        for post in posts.iterator(chunk_size=batch_size):
+            total += 1
+            score = score_of(post, params)
+            if score != post.hot_score:
+                post.hot_score = score
+                changed.append(post)
+            if len(changed) >= batch_size:
+                rescored += self.write(changed)
+                changed = []
+        rescored += self.write(changed)
+
+        if rescored:
+            leaderboard.invalidate()
+        self.stdout.write(f"{rescored} of {total} post(s) rescored")
+
+    def write(self, posts):
+        if posts:
+            with transaction.atomic():
+                Post.objects.bulk_update(posts, ["hot_score"])
+        return len(posts)
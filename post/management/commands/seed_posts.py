@@ -0,0 +1,31 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from post.bench import seed_dataset
+from post.models import Post
+
+
+class Command(BaseCommand):
+    help = "Fill the database with a reproducible synthetic dataset (Zipf-distributed reactions and comments)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=10_000)
+        parser.add_argument("--users", type=int, default=1_000)
+        parser.add_argument("--comments", type=int, default=50_000)
+        parser.add_argument("--reactions", type=int, default=100_000)
+        parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of post and tag popularity")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--force", action="store_true", help="Seed even if the database already has posts")
+
+    def handle(self, *args, **options):
+        if Post.objects.exists() and not options["force"]:
+            raise CommandError("The database already has posts; pass --force to add the dataset anyway")
+        with transaction.atomic():
+            counts = seed_dataset(
+                random.Random(options["seed"]), options["posts"], options["users"],
+                options["comments"], options["reactions"], options["zipf"],
+            )
+        self.stdout.write(json.dumps(counts))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from post import leaderboard, scoring
+from post.bulk import recount, recount_tags
+from post.models import Post, Tag
+from post.signals import send_post_changed
+
+
+class Command(BaseCommand):
+    help = "Recompute Post.like_cnt/dislike_cnt/comments_cnt and Tag.post_cnt and fix any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        # only finds the drift; the fix recounts inside one UPDATE, so a
+        # reaction or comment landing in between is not written over
+        drifted = list(Post.objects.order_by("pk").annotate(
+            real_like_cnt=Count("reactions", filter=Q(reactions__reaction="like"), distinct=True),
+            real_dislike_cnt=Count("reactions", filter=Q(reactions__reaction="dislike"), distinct=True),
+            real_comments_cnt=Count("comments", distinct=True),
+        ).exclude(
+            like_cnt=F("real_like_cnt"), dislike_cnt=F("real_dislike_cnt"), comments_cnt=F("real_comments_cnt"),
+        ).values_list("pk", flat=True))
+        drifted_tags = list(Tag.objects.order_by("pk").annotate(real_post_cnt=Count("post")).exclude(
+            post_cnt=F("real_post_cnt")
+        ).values_list("pk", flat=True))
+
+        if not options["dry_run"]:
+            for start in range(0, len(drifted), batch_size):
+                ids = drifted[start:start + batch_size]
+                with transaction.atomic():
+                    recount(ids)
+                    scoring.refresh(ids)
+                    # cached details, ETags and list versions still hold the drifted numbers
+                    send_post_changed(Post, ids)
+            if drifted_tags:
+                with transaction.atomic():
+                    recount_tags(drifted_tags)
+                    send_post_changed(Tag, [])
+            if drifted:
+                leaderboard.invalidate()
+
+        self.stdout.write(f"{len(drifted)} post(s) and {len(drifted_tags)} tag(s) with drifted counters"
+                          + (" (dry run)" if options["dry_run"] else " fixed"))
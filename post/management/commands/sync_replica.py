@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database into the POST_READ_REPLICAS stand-ins"
+
+    def add_arguments(self, parser):
+        parser.add_argument("aliases", nargs="*", help="replicas to refresh (default: POST_READ_REPLICAS)")
+
+    def handle(self, *args, **options):
+        aliases = options["aliases"] or getattr(settings, "POST_READ_REPLICAS", [])
+        if not aliases:
+            raise CommandError("no replicas given and POST_READ_REPLICAS is empty")
+        primary = connections[DEFAULT_DB_ALIAS]
+        for alias in aliases:
+            if alias not in settings.DATABASES or alias == DEFAULT_DB_ALIAS:
+                raise CommandError(f"{alias!r} is not a replica alias in DATABASES")
+            replica = connections[alias]
+            if primary.vendor != "sqlite" or replica.vendor != "sqlite":
+                raise CommandError("sync_replica only copies SQLite files; use the database's own replication")
+            primary.ensure_connection()
+            replica.ensure_connection()
+            # the online backup API copies a consistent snapshot while the primary stays writable
+            primary.connection.backup(replica.connection)
+            self.stdout.write(f"copied {primary.settings_dict['NAME']} to {alias} ({replica.settings_dict['NAME']})")
@@ -0,0 +1,220 @@
+"""
+Per-view request metrics.
+
+MetricsMiddleware times every request and files it under the route name plus
+the DRF action (``post:posts-detail`` / ``retrieve``). For each of those it
+keeps histograms of latency, query count, DB time, serialization time (the
+renderer turning response.data into bytes) and response size. The aggregates
+live in this process only and are exposed in the Prometheus text format by
+metrics_view.
+
+Queries are seen through an execute wrapper that track_queries puts on every
+new connection. It charges them to the request in the ``current`` context
+variable, so DB work done by async views in sync_to_async threads is counted
+too.
+
+A sampled fraction of requests (METRICS_TRACE_SAMPLE_RATE) also keeps the SQL
+it ran. If such a request goes over METRICS_TRACE_QUERIES queries or
+METRICS_TRACE_LATENCY_MS, the full trace is logged as a warning.
+"""
+import bisect
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+current = contextvars.ContextVar("post_metrics_trace", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, n in zip(self.buckets + ("+Inf",), self.counts):
+            total += n
+            yield bound, total
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.duration = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_duration = Histogram(LATENCY_BUCKETS)
+        self.serialization = Histogram(LATENCY_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+        self.statuses = {}
+
+
+class Registry:
+    # (name, help, ViewMetrics attribute)
+    HISTOGRAMS = [
+        ("post_request_duration_seconds", "Request latency", "duration"),
+        ("post_request_queries", "Database queries per request", "queries"),
+        ("post_request_db_duration_seconds", "Time spent in the database per request", "db_duration"),
+        ("post_request_serialization_seconds", "Time spent rendering the response body", "serialization"),
+        ("post_response_size_bytes", "Response body size", "response_size"),
+    ]
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def record(self, labels, status, duration, queries, db_time, serialization, size):
+        with self.lock:
+            metrics = self.views.get(labels)
+            if metrics is None:
+                metrics = self.views[labels] = ViewMetrics()
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            metrics.duration.observe(duration)
+            metrics.queries.observe(queries)
+            metrics.db_duration.observe(db_time)
+            metrics.serialization.observe(serialization)
+            if size is not None:
+                metrics.response_size.observe(size)
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+
+    def render(self):
+        lines = [
+            "# HELP post_requests_total Requests served",
+            "# TYPE post_requests_total counter",
+        ]
+        with self.lock:
+            views = sorted(self.views.items())
+            for labels, metrics in views:
+                for status, n in sorted(metrics.statuses.items()):
+                    lines.append(f"post_requests_total{{{format_labels(labels, status=status)}}} {n}")
+            for name, help_text, attr in self.HISTOGRAMS:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for labels, metrics in views:
+                    histogram = getattr(metrics, attr)
+                    for bound, n in histogram.cumulative():
+                        lines.append(f"{name}_bucket{{{format_labels(labels, le=bound)}}} {n}")
+                    lines.append(f"{name}_sum{{{format_labels(labels)}}} {histogram.sum:g}")
+                    lines.append(f"{name}_count{{{format_labels(labels)}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def format_labels(labels, **extra):
+    view, action, method = labels
+    pairs = [("view", view), ("action", action), ("method", method)] + list(extra.items())
+    return ",".join(f'{key}="{escape(value)}"' for key, value in pairs)
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RequestTrace:
+    def __init__(self, keep_sql):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0
+        self.serialization = 0
+        self.statements = [] if keep_sql else None
+
+
+def record_query(execute, sql, params, many, context):
+    trace = current.get()
+    if trace is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        trace.queries += 1
+        trace.db_time += elapsed
+        if trace.statements is not None:
+            trace.statements.append((elapsed, sql, params))
+
+
+def track_queries(sender, connection, **kwargs):
+    # at the front so execute_wrapper() blocks, which pop the last wrapper, leave it alone
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def view_labels(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return ("unmatched", "", request.method)
+    # viewsets expose their method -> action map on the view function
+    actions = getattr(match.func, "actions", None) or {}
+    return (match.view_name, actions.get(request.method.lower(), ""), request.method)
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    def process_request(self, request):
+        keep_sql = random.random() < getattr(settings, "METRICS_TRACE_SAMPLE_RATE", 0)
+        request._metrics_trace = RequestTrace(keep_sql)
+        current.set(request._metrics_trace)
+
+    def process_template_response(self, request, response):
+        # rendered here, under the clock, rather than right after this hook
+        # returns; the handler's own render() call is then a no-op. Timing up
+        # to process_response would also charge the inner middlewares' work
+        start = time.perf_counter()
+        response.render()
+        request._metrics_trace.serialization = time.perf_counter() - start
+        return response
+
+    def process_response(self, request, response):
+        trace = getattr(request, "_metrics_trace", None)
+        if trace is None:
+            return response
+        current.set(None)
+        duration = time.perf_counter() - trace.start
+        size = None if response.streaming else len(response.content)
+        labels = view_labels(request)
+        registry.record(labels, response.status_code, duration, trace.queries, trace.db_time, trace.serialization, size)
+        if trace.statements is not None:
+            log_slow_request(request, labels, trace, duration)
+        return response
+
+
+def log_slow_request(request, labels, trace, duration):
+    max_queries = getattr(settings, "METRICS_TRACE_QUERIES", 30)
+    max_ms = getattr(settings, "METRICS_TRACE_LATENCY_MS", 500)
+    if trace.queries <= max_queries and duration * 1000 <= max_ms:
+        return
+    statements = "\n".join(f"  {elapsed * 1000:.2f} ms  {sql}  {params!r}" for elapsed, sql, params in trace.statements)
+    logger.warning(
+        "slow request %s %s (%s/%s): %.1f ms, %d queries, %.1f ms in the database\n%s",
+        request.method, request.get_full_path(), labels[0], labels[1] or "-",
+        duration * 1000, trace.queries, trace.db_time * 1000, statements,
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def metrics_view(request):
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
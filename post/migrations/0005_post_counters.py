@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:52
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count_subquery(model, **filters):
+    counts = (
+        model.objects.filter(post=OuterRef("pk"), **filters)
+        .order_by()
+        .values("post")
+        .annotate(cnt=Count("pk"))
+        .values("cnt")
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def backfill_counters(apps, schema_editor):
+    Post = apps.get_model("post", "Post")
+    Comment = apps.get_model("post", "Comment")
+    PostReaction = apps.get_model("post", "PostReaction")
+    Post.objects.using(schema_editor.connection.alias).update(
+        like_cnt=_count_subquery(PostReaction, reaction="like"),
+        dislike_cnt=_count_subquery(PostReaction, reaction="dislike"),
+        comments_cnt=_count_subquery(Comment),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0004_remove_post_like'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_cnt',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='dislike_cnt',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_cnt',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
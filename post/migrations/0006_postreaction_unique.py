@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:55
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def dedupe_reactions(apps, schema_editor):
+    # keep the most recent reaction per (post, user) and recount the touched posts
+    Post = apps.get_model("post", "Post")
+    PostReaction = apps.get_model("post", "PostReaction")
+    db = schema_editor.connection.alias
+    duplicates = (
+        PostReaction.objects.using(db).values("post", "user")
+        .annotate(keep=Max("id"), n=Count("id"))
+        .filter(n__gt=1)
+    )
+    post_ids = set()
+    for row in duplicates:
+        PostReaction.objects.using(db).filter(post=row["post"], user=row["user"]).exclude(
+            id=row["keep"]
+        ).delete()
+        post_ids.add(row["post"])
+
+    for post in Post.objects.using(db).filter(id__in=post_ids).annotate(
+        real_like_cnt=Count("reactions", filter=Q(reactions__reaction="like")),
+        real_dislike_cnt=Count("reactions", filter=Q(reactions__reaction="dislike")),
+    ):
+        post.like_cnt = post.real_like_cnt
+        post.dislike_cnt = post.real_dislike_cnt
+        post.save(using=db, update_fields=["like_cnt", "dislike_cnt"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0005_post_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_reactions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='postreaction',
+            constraint=models.UniqueConstraint(fields=('post', 'user'), name='unique_post_reaction'),
+        ),
+    ]
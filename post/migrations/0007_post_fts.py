@@ -0,0 +1,48 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+import post.models
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS post_post_fts USING fts5("
+        "title, writer, content, content='post_post', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute("INSERT INTO post_post_fts(post_post_fts) VALUES ('rebuild')")
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for trigger in ("post_post_fts_ai", "post_post_fts_ad", "post_post_fts_au"):
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    schema_editor.execute("DROP TABLE IF EXISTS post_post_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0006_postreaction_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearchIndex',
+            fields=[
+                ('post', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='post.post')),
+                ('document', post.models.FullTextField(db_column='post_post_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'post_post_fts',
+                'managed': False,
+            },
+        ),
+        # the sync triggers are installed by post.search.install_triggers after migrate
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:02
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_tags(apps, schema_editor):
+    # point posts at the oldest tag of each name, then drop the duplicates
+    Tag = apps.get_model("post", "Tag")
+    Through = apps.get_model("post", "Post").tag.through
+    db = schema_editor.connection.alias
+    duplicates = Tag.objects.using(db).values("name").annotate(keep=Min("id"), n=Count("id")).filter(n__gt=1)
+    for row in duplicates:
+        extra = list(Tag.objects.using(db).filter(name=row["name"]).exclude(id=row["keep"]).values_list("id", flat=True))
+        tagged = set(Through.objects.using(db).filter(tag_id=row["keep"]).values_list("post_id", flat=True))
+        moved = set(Through.objects.using(db).filter(tag_id__in=extra).values_list("post_id", flat=True)) - tagged
+        Through.objects.using(db).bulk_create([Through(post_id=post_id, tag_id=row["keep"]) for post_id in moved])
+        Through.objects.using(db).filter(tag_id__in=extra).delete()
+        Tag.objects.using(db).filter(id__in=extra).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0007_post_fts'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_tags, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tag',
+            name='name',
+            field=models.CharField(max_length=50, unique=True),
+        ),
+    ]
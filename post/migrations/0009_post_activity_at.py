@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:04
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_activity_at(apps, schema_editor):
+    apps.get_model("post", "Post").objects.using(schema_editor.connection.alias).update(activity_at=F("updated_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0008_tag_name_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='activity_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(backfill_activity_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:09
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_post_cnt(apps, schema_editor):
+    Tag = apps.get_model("post", "Tag")
+    Through = apps.get_model("post", "Post").tag.through
+    counts = (
+        Through.objects.filter(tag_id=OuterRef("pk"))
+        .order_by()
+        .values("tag_id")
+        .annotate(cnt=Count("pk"))
+        .values("cnt")
+    )
+    Tag.objects.using(schema_editor.connection.alias).update(post_cnt=Coalesce(Subquery(counts, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0009_post_activity_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='post_cnt',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(backfill_post_cnt, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:38
+
+from django.db import migrations, models
+
+from post.scoring import hot_score
+
+
+def backfill_hot_score(apps, schema_editor):
+    Post = apps.get_model("post", "Post")
+    db = schema_editor.connection.alias
+    posts = []
+    for post in Post.objects.using(db).only("like_cnt", "dislike_cnt", "comments_cnt", "created_at").iterator(chunk_size=2000):
+        post.hot_score = hot_score(post.like_cnt, post.dislike_cnt, post.comments_cnt, post.created_at)
+        posts.append(post)
+    Post.objects.using(db).bulk_update(posts, ["hot_score"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0013_tag_ordering'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='hot_score',
+            field=models.FloatField(db_index=True, default=0),
+        ),
+        migrations.RunPython(backfill_hot_score, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:26
+
+import math
+
+from django.conf import settings
+from django.db import migrations, models
+import django.utils.timezone
+
+# post.scoring as of this migration, so a later change to the formula does
+# not change what it wrote; the weights are still the deployment's own
+EPOCH = 1704067200
+DEFAULTS = {"like": 1.0, "dislike": 1.0, "comment": 0.5, "decay_hours": 12.5}
+
+
+def hot_score(like_cnt, dislike_cnt, comments_cnt, created_at, params):
+    engagement = params["like"] * like_cnt - params["dislike"] * dislike_cnt + params["comment"] * comments_cnt
+    magnitude = math.log10(max(abs(engagement), 1))
+    age = created_at.timestamp() - EPOCH
+    return math.copysign(magnitude, engagement) + age / (params["decay_hours"] * 3600)
+
+
+def rescore(apps, schema_editor, batch_size=500):
+    # hot scores now count age from EPOCH
+    Post = apps.get_model("post", "Post")
+    db = schema_editor.connection.alias
+    params = {**DEFAULTS, **getattr(settings, "POST_HOT_SCORE", {})}
+    posts = []
+    for post in Post.objects.using(db).only("like_cnt", "dislike_cnt", "comments_cnt", "created_at").iterator(chunk_size=2000):
+        post.hot_score = hot_score(post.like_cnt, post.dislike_cnt, post.comments_cnt, post.created_at, params)
+        posts.append(post)
+        if len(posts) >= batch_size:
+            Post.objects.using(db).bulk_update(posts, ["hot_score"])
+            posts = []
+    Post.objects.using(db).bulk_update(posts, ["hot_score"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0017_counter_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(rescore, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:31
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def copy_created_at(apps, schema_editor):
+    Post = apps.get_model("post", "Post")
+    PostTag = apps.get_model("post", "PostTag")
+    db = schema_editor.connection.alias
+    PostTag.objects.using(db).update(
+        created_at=Subquery(Post.objects.using(db).filter(pk=OuterRef("post_id")).values("created_at")[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0018_post_created_at_default'),
+    ]
+
+    operations = [
+        # Post.tag's auto-created table becomes PostTag as it is
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='PostTag',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='post.post')),
+                        ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='post.tag')),
+                    ],
+                    options={
+                        'db_table': 'post_post_tag',
+                        'unique_together': {('post', 'tag')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='post',
+                    name='tag',
+                    field=models.ManyToManyField(blank=True, through='post.PostTag', to='post.tag'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='posttag',
+            name='created_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='posttag',
+            name='created_at',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name='posttag',
+            index=models.Index(fields=['tag', 'created_at', 'post'], name='post_tag_created_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:53
+
+import time
+
+from django.db import migrations, models
+
+
+def create_version(apps, schema_editor):
+    PostListVersion = apps.get_model("post", "PostListVersion")
+    PostListVersion.objects.using(schema_editor.connection.alias).create(pk=1, version=time.time_ns())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0019_post_tag_created_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostListVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField()),
+            ],
+        ),
+        migrations.RunPython(create_version, migrations.RunPython.noop),
+    ]
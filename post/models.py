@@ -1,35 +1,207 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 # Create your models here.
 def image_upload_path(instance, filename):
-    return f'{instance.id}/{filename}'
+    # only used when a file is assigned directly; the API stores uploads
+    # under their content hash through post.images.store_upload
+    return f'images/{filename}'
 
 class Tag(models.Model):
     id =  models.AutoField(primary_key=True)
-    name = models.CharField(max_length=50)
+    name = models.CharField(max_length=50, unique=True)
+    # number of posts carrying the tag, maintained by post.tags.set_post_tags
+    post_cnt = models.PositiveIntegerField(default=0, db_index=True)
+    # number of TagFollow rows, maintained by post.feed.follow/unfollow
+    follower_cnt = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # a post's tags are listed in the order they were first created
+        ordering = ["id"]
 
 class Post(models.Model):
     id = models.AutoField(primary_key=True)
     title = models.CharField(max_length=50)
     writer = models.CharField(max_length=50)
     content = models.CharField(max_length=1000)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # a default rather than auto_now_add, so it is set before pre_save and
+    # post.scoring scores a new post with the created_at that gets stored
+    created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
-    tag = models.ManyToManyField(Tag, blank=True)
+    tag = models.ManyToManyField(Tag, blank=True, through="PostTag")
     image = models.ImageField(upload_to=image_upload_path,blank=True, null=True)
+    # storage names of the resized copies of image, filled in by post.images
+    image_variants = models.JSONField(default=dict, blank=True)
+    # denormalized counters, kept in sync by the views with F() updates
+    # and reconciled by the sync_post_counters command
+    like_cnt = models.PositiveIntegerField(default=0)
+    dislike_cnt = models.PositiveIntegerField(default=0)
+    comments_cnt = models.PositiveIntegerField(default=0)
+    # ranking for recommend, recomputed from the counters by post.scoring
+    hot_score = models.FloatField(default=0, db_index=True)
+    # bumped on every change to the post, its tags, comments or reactions;
+    # drives the ETag/Last-Modified validators in post.conditional
+    activity_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # keyset pages and ?ordering= walk these, id is the tie-breaker
+            models.Index(fields=["created_at", "id"], name="post_created_at_id_idx"),
+            models.Index(fields=["updated_at", "id"], name="post_updated_at_id_idx"),
+            models.Index(fields=["like_cnt", "id"], name="post_like_cnt_id_idx"),
+            models.Index(fields=["dislike_cnt", "id"], name="post_dislike_cnt_id_idx"),
+            # exact-match filterset_fields
+            models.Index(fields=["title"], name="post_title_idx"),
+            models.Index(fields=["writer"], name="post_writer_idx"),
+        ]
+
 
-    
+class PostListVersion(models.Model):
+    # a single row: nanosecond time of the last change to anything a post list
+    # or tag page renders, bumped by post.signals.send_post_changed in the
+    # writer's transaction; see post.conditional.posts_version
+    version = models.PositiveBigIntegerField()
+
+
+class PostTag(models.Model):
+    # Post.tag's through table (the one Django created for it before)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+    # copy of post.created_at, so a tag page is read off post_tag_created_idx alone
+    created_at = models.DateTimeField()
+
+    class Meta:
+        db_table = "post_post_tag"
+        unique_together = [("post", "tag")]
+        indexes = [
+            # a tag's posts newest first, post is the keyset tie-breaker
+            models.Index(fields=["tag", "created_at", "post"], name="post_tag_created_idx"),
+        ]
 
 class Comment(models.Model):
     id = models.AutoField(primary_key=True)
-    post = models.ForeignKey(Post, blank=False, null=False, on_delete=models.CASCADE, related_name="comments")
+    # indexed through comment_post_created_idx, which starts with post
+    post = models.ForeignKey(Post, blank=False, null=False, on_delete=models.CASCADE, related_name="comments", db_index=False)
     writer = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField(max_length=200)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # a post's comments newest first, see serializers.recent_comments
+            # and CommentCursorPagination
+            models.Index(fields=["post", "created_at", "id"], name="comment_post_created_idx"),
+        ]
+
 class PostReaction(models.Model):
     REACTION_CHOICES = (("like","Like"),("dislike","Dislike"))
     reaction = models.CharField(choices=REACTION_CHOICES, max_length=10)
-    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="reactions")
+    # indexed through the two composites below, which both start with post
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="reactions", db_index=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            # also the index for the (post, user) lookups in toggle_reaction
+            models.UniqueConstraint(fields=["post", "user"], name="unique_post_reaction"),
+        ]
+        indexes = [
+            # covers per-post counts by reaction without touching the table
+            models.Index(fields=["post", "reaction"], name="reaction_post_reaction_idx"),
+        ]
+
+class TagFollow(models.Model):
+    # indexed through unique_tag_follow, which starts with user
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name="follows")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "tag"], name="unique_tag_follow"),
+        ]
+
+class FeedEntry(models.Model):
+    # a post fanned out to a follower of one of its tags, see post.feed
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="feed_entries")
+    # copy of post.created_at, so a feed page is read off feed_user_created_idx alone
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "post"], name="unique_feed_entry"),
+        ]
+        indexes = [
+            # a user's feed newest first, post is the keyset tie-breaker
+            models.Index(fields=["user", "created_at", "post"], name="feed_user_created_idx"),
+        ]
+
+class ArchivedPost(models.Model):
+    # a post moved out of the hot tables by post.archive, under its original id
+    id = models.IntegerField(primary_key=True)
+    title = models.CharField(max_length=50)
+    writer = models.CharField(max_length=50)
+    content = models.CharField(max_length=1000)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    image = models.ImageField(upload_to=image_upload_path, blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True)
+    # tag names in Post.tag order; archived posts no longer count in Tag.post_cnt
+    tags = models.JSONField(default=list, blank=True)
+    # final counters, recounted from the rows archived with the post
+    like_cnt = models.PositiveIntegerField(default=0)
+    dislike_cnt = models.PositiveIntegerField(default=0)
+    comments_cnt = models.PositiveIntegerField(default=0)
+    activity_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+class ArchivedComment(models.Model):
+    id = models.IntegerField(primary_key=True)
+    # indexed through archived_comment_post_idx, which starts with post
+    post = models.ForeignKey(ArchivedPost, on_delete=models.CASCADE, related_name="comments", db_index=False)
+    writer = models.ForeignKey(User, on_delete=models.CASCADE)
+    content = models.TextField(max_length=200)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # same access path as comment_post_created_idx
+            models.Index(fields=["post", "created_at", "id"], name="archived_comment_post_idx"),
+        ]
+
+class ArchivedReaction(models.Model):
+    reaction = models.CharField(choices=PostReaction.REACTION_CHOICES, max_length=10)
+    # indexed through unique_archived_reaction, which starts with post
+    post = models.ForeignKey(ArchivedPost, on_delete=models.CASCADE, related_name="reactions", db_index=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["post", "user"], name="unique_archived_reaction"),
+        ]
+
+class FullTextField(models.TextField):
+    """The hidden table-named column of an FTS5 table; only used with __match."""
+
+@FullTextField.register_lookup
+class Match(models.Lookup):
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", lhs_params + rhs_params
+
+class PostSearchIndex(models.Model):
+    # SQLite FTS5 table over Post.title/writer/content, see post.search
+    post = models.OneToOneField(Post, primary_key=True, db_column="rowid", db_constraint=False,
+                                on_delete=models.DO_NOTHING, related_name="search_index")
+    document = FullTextField(db_column="post_post_fts")
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = "post_post_fts"
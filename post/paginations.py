@@ -1,6 +1,200 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 
 class PostPagination(PageNumberPagination):
     page_size = 5
     page_size_query_param = 'page_size'
-    max_page_size = 10
\ No newline at end of file
+    max_page_size = 10
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on (ordering field, id).
+
+    Pages are fetched with a WHERE on the last seen key instead of OFFSET and
+    no COUNT(*) is issued, so every page costs the same regardless of depth.
+    The ordering field comes from the ?ordering= parameter when it is one of
+    ordering_fields, otherwise default_ordering is used.
+    """
+    page_size = 5
+    page_size_query_param = 'page_size'
+    max_page_size = 10
+    cursor_query_param = 'cursor'
+    ordering_param = api_settings.ORDERING_PARAM
+    ordering_fields = ['created_at']
+    default_ordering = '-created_at'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        return self.set_page([row async for row in self.page_queryset(queryset, request)])
+
+    def page_queryset(self, queryset, request):
+        """The sliced queryset for the requested page, one row past page_size."""
+        keys = self.start(request, queryset.model)
+        queryset = queryset.order_by(*keys)
+        if self.cursor is not None:
+            queryset = queryset.filter(self.after(keys, self.cursor['position']))
+        return queryset[:self.page_size + 1]
+
+    def start(self, request, model):
+        """Read page size, ordering and cursor from request; returns the keys to fetch the page in."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.model = model
+        self.keys = self.get_keys(request)
+        self.cursor = self.decode_cursor(request)
+        return [self.flip(k) for k in self.keys] if self.reverse else self.keys
+
+    @property
+    def reverse(self):
+        return self.cursor is not None and self.cursor['reverse']
+
+    def set_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_keys(self, request):
+        ordering = request.query_params.get(self.ordering_param, '').split(',')[0].strip()
+        if ordering.lstrip('-') not in self.ordering_fields:
+            ordering = self.default_ordering
+        return [ordering, '-id' if ordering.startswith('-') else 'id']
+
+    def token_after(self, row):
+        """Cursor token for the page following row under default_ordering."""
+        self.keys = [self.default_ordering, '-id' if self.default_ordering.startswith('-') else 'id']
+        return self.make_token(row, reverse=False)
+
+    @staticmethod
+    def flip(key):
+        return key[1:] if key.startswith('-') else '-' + key
+
+    @staticmethod
+    def after(keys, position):
+        (field, value), (id_key, id_value) = zip(keys, position)
+        name, id_name = field.lstrip('-'), id_key.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        # the outer bound is what lets the (field, id) index seek to the cursor
+        # instead of scanning from the top; the OR alone is not sargable
+        bound = Q(**{f'{name}__{lookup}e': value})
+        return bound & (Q(**{f'{name}__{lookup}': value}) | Q(**{name: value, f'{id_name}__{lookup}': id_value}))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode()))
+            field = self.model._meta.get_field(self.keys[0].lstrip('-'))
+            value, pk = cursor['p']
+            if value is None or isinstance(value, (list, dict, bool)):
+                raise ValueError(value)
+            return {
+                'position': [field.to_python(value), int(pk)],
+                'reverse': bool(cursor['r']),
+            }
+        except (TypeError, ValueError, KeyError, DjangoValidationError):
+            raise NotFound('Invalid cursor')
+
+    def make_token(self, row, reverse):
+        # rows are model instances, or dicts from a values() projection
+        get = row.get if isinstance(row, dict) else row.__getattribute__
+        value = get(self.keys[0].lstrip('-'))
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        cursor = json.dumps({'p': [value, get('id')], 'r': reverse}, separators=(',', ':'))
+        return urlsafe_b64encode(cursor.encode()).decode()
+
+    def encode_cursor(self, row, reverse):
+        token = self.make_token(row, reverse)
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, token)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class PostCursorPagination(KeysetPagination):
+    ordering_fields = ['created_at', 'updated_at', 'like_cnt', 'dislike_cnt']
+
+
+class TagPagination(PostCursorPagination):
+    """
+    Cursor pages of a tag's posts, from post.tags.tag_posts. Newest-first
+    pages (the default) are keyed on the PostTag link's copy of created_at,
+    so they are read off post_tag_created_idx and cost the same however many
+    posts the tag has. Other orderings sort the tag's posts.
+    """
+    link_keys = {'created_at': 'link_created_at', 'id': 'link_post_id'}
+
+    def page_queryset(self, queryset, request):
+        keys = self.start(request, queryset.model)
+        if keys[0].lstrip('-') != 'created_at':
+            return super().page_queryset(queryset, request)
+        keys = [('-' if key.startswith('-') else '') + self.link_keys[key.lstrip('-')] for key in keys]
+        queryset = queryset.order_by(*keys)
+        if self.cursor is not None:
+            queryset = queryset.filter(self.after(keys, self.cursor['position']))
+        return queryset[:self.page_size + 1]
+
+
+class CommentCursorPagination(KeysetPagination):
+    ordering_fields = ['created_at']
+
+
+class SelectablePaginationMixin:
+    """
+    Lets a client opt into cursor_pagination_class with ?pagination=cursor (or
+    by following a cursor link); other requests keep pagination_class.
+    """
+    cursor_pagination_class = None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if self.cursor_pagination_class is not None and (
+                params.get('pagination') == 'cursor' or 'cursor' in params
+            ):
+                self._paginator = self.cursor_pagination_class()
+            elif self.pagination_class is None:
+                self._paginator = None
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
@@ -0,0 +1,51 @@
+"""
+orjson-backed JSON renderer and parser, registered in REST_FRAMEWORK.
+
+ORJSONRenderer produces the same bytes as DRF's JSONRenderer with its default
+UNICODE_JSON and COMPACT_JSON settings. Datetimes, Decimals, lazy strings and
+other values orjson can't encode itself go to DRF's JSONEncoder, so they are
+formatted as before. Indented output (``Accept: application/json; indent=4``)
+and ASCII-only or non-compact settings still go through JSONRenderer, because
+orjson only indents by two spaces. Without orjson installed, both classes
+behave exactly like their DRF bases.
+"""
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+if orjson is not None:
+    OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONRenderer(JSONRenderer):
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+        ret = orjson.dumps(data, default=self.encoder.default, option=OPTIONS)
+        # JSONRenderer escapes U+2028/U+2029 so the output stays a JavaScript subset
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
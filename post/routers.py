@@ -0,0 +1,110 @@
+"""
+Read/write splitting between the primary database and read replicas.
+
+ReplicaMiddleware decides per request where reads may go. GET, HEAD and
+OPTIONS requests read from one of the POST_READ_REPLICAS aliases, picked at
+random once per request. Other requests use the primary only. Writes always
+go to the primary, and once a request has written (select_for_update counts
+as a write), its remaining reads go to the primary too. Outside a request
+(management commands, migrations) the router stays out of the way and
+Django's defaults apply.
+
+Replicas lag behind, so a client that has just written is pinned to the
+primary for POST_REPLICA_STICKY_SECONDS: the response carries a cookie with
+the pin's expiry, and while it is valid the client's safe requests read from
+the primary too. That way a user sees their own like or comment straight
+away.
+
+Shared caches (the detail cache, leaderboards) are only filled from the
+primary: an entry built from a lagging replica would otherwise be served
+under the post's new version to everyone, including the pinned writer.
+Builders check reads_from_replica() and skip the cache write.
+
+With POST_READ_REPLICAS empty, everything goes to the primary.
+"""
+import contextvars
+import random
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.deprecation import MiddlewareMixin
+
+PIN_COOKIE = "post_primary_until"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+current = contextvars.ContextVar("post_routing_state", default=None)
+
+
+def _replicas():
+    return getattr(settings, "POST_READ_REPLICAS", [])
+
+
+def _sticky_seconds():
+    return getattr(settings, "POST_REPLICA_STICKY_SECONDS", 5)
+
+
+class RoutingState:
+    def __init__(self, replica):
+        self.replica = replica
+        self.wrote = False
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = current.get()
+        if state is None:
+            return None
+        if state.replica is None or state.wrote:
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = current.get()
+        if state is None:
+            return None
+        state.wrote = True
+        # even for an instance that was read from a replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the primary's rows, so objects from either are related
+        databases = {DEFAULT_DB_ALIAS, *_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+def reads_from_replica():
+    """True while the current request's reads go to a replica."""
+    state = current.get()
+    return state is not None and state.replica is not None and not state.wrote
+
+
+def is_pinned(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class ReplicaMiddleware(MiddlewareMixin):
+    def process_request(self, request):
+        replicas = _replicas()
+        replica = None
+        if replicas and request.method in SAFE_METHODS and not is_pinned(request):
+            replica = random.choice(replicas)
+        request._routing_state = RoutingState(replica)
+        current.set(request._routing_state)
+
+    def process_response(self, request, response):
+        state = getattr(request, "_routing_state", None)
+        if state is None:
+            return response
+        current.set(None)
+        if state.wrote and _replicas():
+            seconds = _sticky_seconds()
+            response.set_cookie(
+                PIN_COOKIE, f"{time.time() + seconds:.3f}", max_age=seconds, httponly=True, samesite="Lax"
+            )
+        return response
@@ -0,0 +1,67 @@
+"""
+Hot score behind PostViewSet.recommend.
+
+    engagement = like * like_cnt - dislike * dislike_cnt + comment * comments_cnt
+    hot_score  = sign(engagement) * log10(max(|engagement|, 1))
+                 + (created_at - EPOCH) in seconds / (decay_hours * 3600)
+
+A post has to draw ten times the engagement of one posted decay_hours later
+to rank level with it. Age enters only through the creation time, so a stored
+score never goes stale just because time passed. It only changes with the
+counters, and refresh() is called wherever those change. That lets recommend
+read Post.hot_score straight off its index. The weights come from
+settings.POST_HOT_SCORE. After changing them, run the recompute_hot_scores
+command to rescore every post. Ages are counted from a fixed EPOCH rather
+than 1970, so the age term stays small and the engagement term keeps its
+float precision.
+"""
+import math
+
+from django.conf import settings
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+
+from .models import Post
+
+# 2024-01-01T00:00:00Z as a POSIX timestamp
+EPOCH = 1704067200
+DEFAULTS = {"like": 1.0, "dislike": 1.0, "comment": 0.5, "decay_hours": 12.5}
+
+
+def parameters():
+    return {**DEFAULTS, **getattr(settings, "POST_HOT_SCORE", {})}
+
+
+def hot_score(like_cnt, dislike_cnt, comments_cnt, created_at, params=None):
+    params = params or parameters()
+    engagement = params["like"] * like_cnt - params["dislike"] * dislike_cnt + params["comment"] * comments_cnt
+    magnitude = math.log10(max(abs(engagement), 1))
+    age = created_at.timestamp() - EPOCH
+    return math.copysign(magnitude, engagement) + age / (params["decay_hours"] * 3600)
+
+
+def score_of(post, params=None):
+    return hot_score(post.like_cnt, post.dislike_cnt, post.comments_cnt, post.created_at, params)
+
+
+@receiver(pre_save, sender=Post)
+def score_post(sender, instance, **kwargs):
+    instance.hot_score = score_of(instance)
+
+
+def refresh(post_ids):
+    """Rescore post_ids from their current counters; call after updating them with F()."""
+    posts = list(Post.objects.filter(pk__in=list(post_ids)).only(
+        "like_cnt", "dislike_cnt", "comments_cnt", "created_at", "hot_score"
+    ))
+    params = parameters()
+    changed = []
+    for post in posts:
+        score = score_of(post, params)
+        if score != post.hot_score:
+            post.hot_score = score
+            changed.append(post)
+    if len(changed) == 1:
+        Post.objects.filter(pk=changed[0].pk).update(hot_score=changed[0].hot_score)
+    elif changed:
+        Post.objects.bulk_update(changed, ["hot_score"])
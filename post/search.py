@@ -0,0 +1,145 @@
+"""
+Indexed full-text search over posts.
+
+PostSearchFilter replaces DRF's SearchFilter on PostViewSet. ``?search=`` is
+split into terms: a term starting with ``#`` must equal one of the post's tag
+names, every other term must prefix-match a word of the title, writer or
+content. Hashtags stay in the content, so a plain ``python`` still finds posts
+tagged ``#python``. Results are ranked by relevance unless the client asks for
+an explicit ``?ordering=``.
+
+The backend is picked from the database vendor, or from POST_SEARCH_BACKEND
+(a dotted path) when set.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+from .models import Post
+
+FTS_TABLE = "post_post_fts"
+
+
+class SearchBackend:
+    """Narrows a Post queryset to rows whose text matches every term."""
+
+    def search(self, queryset, terms, ranked):
+        raise NotImplementedError
+
+
+class LikeSearchBackend(SearchBackend):
+    """Unindexed fallback with the old icontains semantics and no ranking."""
+
+    def search(self, queryset, terms, ranked):
+        for term in terms:
+            queryset = queryset.filter(
+                Q(title__icontains=term) | Q(writer__icontains=term) | Q(content__icontains=term)
+            )
+        return queryset
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """FTS5 external-content table over post_post (PostSearchIndex), kept in sync by triggers."""
+
+    def match(self, terms):
+        # quote every term so user input cannot inject FTS operators; * makes it a prefix match
+        return " ".join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+    def search(self, queryset, terms, ranked):
+        queryset = queryset.filter(search_index__document__match=self.match(terms))
+        if ranked:
+            # FTS5 rank is bm25, lower is better
+            queryset = queryset.order_by("search_index__rank", "-id")
+        return queryset
+
+
+class PostgresSearchBackend(SearchBackend):
+    """Postgres full-text search; pair it with a GIN index on the same vector."""
+
+    def search(self, queryset, terms, ranked):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        vector = SearchVector("title", "writer", "content")
+        query = SearchQuery(" & ".join(f"{term}:*" for term in terms), search_type="raw")
+        queryset = queryset.annotate(search_vector=vector).filter(search_vector=query)
+        if ranked:
+            queryset = queryset.annotate(search_rank=SearchRank(vector, query)).order_by("-search_rank", "-id")
+        return queryset
+
+
+VENDOR_BACKENDS = {
+    "sqlite": SQLiteFTSBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+def get_backend():
+    path = getattr(settings, "POST_SEARCH_BACKEND", None)
+    if path:
+        return import_string(path)()
+    return VENDOR_BACKENDS.get(connection.vendor, LikeSearchBackend)()
+
+
+def parse_terms(query):
+    words = query.replace(",", " ").split()
+    tags = [w[1:] for w in words if w.startswith("#") and len(w) > 1]
+    terms = [w for w in words if not w.startswith("#")]
+    return terms, tags
+
+
+class PostSearchFilter(BaseFilterBackend):
+    search_param = api_settings.SEARCH_PARAM
+    ordering_param = api_settings.ORDERING_PARAM
+
+    def filter_queryset(self, request, queryset, view):
+        terms, tags = parse_terms(request.query_params.get(self.search_param, ""))
+        for tag in tags:
+            queryset = queryset.filter(id__in=Post.tag.through.objects.filter(tag__name=tag).values("post_id"))
+        if terms:
+            ranked = not request.query_params.get(self.ordering_param)
+            queryset = get_backend().search(queryset, terms, ranked)
+        return queryset
+
+
+TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS post_post_fts_ai AFTER INSERT ON post_post BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, writer, content)
+        VALUES (new.id, new.title, new.writer, new.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS post_post_fts_ad AFTER DELETE ON post_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, writer, content)
+        VALUES ('delete', old.id, old.title, old.writer, old.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS post_post_fts_au AFTER UPDATE OF title, writer, content ON post_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, writer, content)
+        VALUES ('delete', old.id, old.title, old.writer, old.content);
+        INSERT INTO {FTS_TABLE}(rowid, title, writer, content)
+        VALUES (new.id, new.title, new.writer, new.content);
+    END
+    """,
+]
+
+
+def install_triggers(using="default", **kwargs):
+    """
+    post_migrate hook. SQLite migrations that rebuild post_post drop its
+    triggers, so they are (re)created after every migrate.
+    """
+    from django.db import connections
+
+    conn = connections[using]
+    if conn.vendor != "sqlite":
+        return
+    with conn.cursor() as cursor:
+        if FTS_TABLE not in conn.introspection.table_names(cursor):
+            return
+        for sql in TRIGGERS:
+            cursor.execute(sql)
@@ -1,5 +1,55 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.urls import reverse
 from rest_framework import serializers
+from rest_framework.utils.urls import replace_query_param
 from .models import *
+from .paginations import CommentCursorPagination
+from .images import schedule_variants, store_upload
+
+class ImageVariantField(serializers.Field):
+    """URL of one of the resized copies listed in Post.image_variants, or None until it exists."""
+
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        kwargs.update(source = "image_variants", read_only = True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, variants):
+        name = (variants or {}).get(self.variant)
+        if not name:
+            return None
+        url = default_storage.url(name)
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request is not None else url
+
+class ImageUploadMixin:
+    """
+    Stores the uploaded image by content hash in the same save as the post.
+    Updates save only the edited columns (and the auto_now ones), so counters
+    that F() updates changed since the post was read are not written back.
+    """
+
+    def create(self, validated_data):
+        self.store_image(validated_data)
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        self.store_image(validated_data)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        touched = [field.name for field in instance._meta.concrete_fields if getattr(field, "auto_now", False)]
+        instance.save(update_fields=[*validated_data, *touched])
+        return instance
+
+    def store_image(self, validated_data):
+        image = validated_data.get("image")
+        if image:
+            validated_data["image"] = store_upload(image)
+            validated_data["image_variants"] = {}
+            schedule_variants(validated_data["image"])
 
 class CommentSerializer(serializers.ModelSerializer):
     
@@ -12,18 +62,43 @@ class CommentSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['id','post']
 
-class PostSerializer(serializers.ModelSerializer):
+def recent_comments(queryset):
+    """The comments embedded in a post detail body, plus one to tell if there are more."""
+    limit = getattr(settings, "POST_DETAIL_COMMENTS", 10)
+    return queryset.order_by("-created_at", "-id")[:limit + 1]
 
+class PostSerializer(ImageUploadMixin, serializers.ModelSerializer):
+
+    # only the newest POST_DETAIL_COMMENTS comments are embedded, the rest
+    # are reached through comments_next (a cursor page of /posts/{id}/comments)
     comments = serializers.SerializerMethodField()
+    comments_next = serializers.SerializerMethodField()
     tag = serializers.SerializerMethodField()
     image =  serializers.ImageField(use_url = True, required = False)
-    like_cnt = serializers.IntegerField()
-    dislike_cnt = serializers.IntegerField()
-
+    thumbnail = ImageVariantField("thumbnail")
+    thumbnail_webp = ImageVariantField("thumbnail_webp")
 
     def get_comments(self, instance):
-        serializer = CommentSerializer(instance.comments, many = True)
-        return serializer.data
+        limit = getattr(settings, "POST_DETAIL_COMMENTS", 10)
+        # async views load these ahead of time (see post.async_views)
+        comments = getattr(instance, "recent_comments", None)
+        if comments is None:
+            comments = list(recent_comments(instance.comments.all()))
+        for comment in comments:
+            comment.post = instance
+        self._comments_after = comments[limit - 1] if len(comments) > limit else None
+        return CommentSerializer(comments[:limit], many = True).data
+
+    def get_comments_next(self, instance):
+        last = getattr(self, "_comments_after", None)
+        if last is None:
+            return None
+        url = reverse("post:comments-list", kwargs={"post_id": instance.id})
+        request = self.context.get("request")
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        url = replace_query_param(url, "pagination", "cursor")
+        return replace_query_param(url, "cursor", CommentCursorPagination().token_after(last))
     
     def get_tag(self, instance):
         tags = instance.tag.all()
@@ -31,21 +106,27 @@ class PostSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Post
-        # exclude = ('like_cnt','like')
-        fields = '__all__'
-        read_only_fields = ['id', 'created_at', 'updated_at','comments','like_cnt']
-        
+        exclude = ['image_variants', 'hot_score']
+        read_only_fields = ['id', 'created_at', 'updated_at','comments','like_cnt','dislike_cnt','comments_cnt','activity_at']
+
+class ArchivedPostSerializer(PostSerializer):
+    """Renders an ArchivedPost into the same body PostSerializer gave the post."""
+
+    def get_tag(self, instance):
+        return instance.tags
+
+    class Meta:
+        model = ArchivedPost
+        exclude = ['image_variants', 'tags', 'archived_at']
+        read_only_fields = PostSerializer.Meta.read_only_fields
+
 
 class PostListSerializer(serializers.ModelSerializer):
-    comments_cnt =  serializers.SerializerMethodField()
     tag = serializers.SerializerMethodField()
     image =  serializers.ImageField(use_url = True, required = False)
-    like_cnt = serializers.IntegerField()
-    dislike_cnt = serializers.IntegerField()
+    thumbnail = ImageVariantField("thumbnail")
+    thumbnail_webp = ImageVariantField("thumbnail_webp")
 
-    def get_comments_cnt(self, instance):
-        return instance.comments.count()
-    
     def get_tag(self, instance):
         tags = instance.tag.all()
         return [tag.name for tag in tags]
@@ -53,11 +134,77 @@ class PostListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Post
-        fields = ['id','title','writer','created_at','updated_at','comments_cnt','tag','image','like_cnt','dislike_cnt']
-        read_only_field = ['id', 'created_at', 'updated_at','comments_cnt','like_cnt','dislike_cnt']
+        fields = ['id','title','writer','created_at','updated_at','comments_cnt','tag','image','thumbnail','thumbnail_webp','like_cnt','dislike_cnt']
+        read_only_fields = ['id', 'created_at', 'updated_at','comments_cnt','like_cnt','dislike_cnt']
+
+class PostListProjection:
+    """
+    Read-only fast path for PostListSerializer(many=True).
+
+    project() narrows a post queryset to the listed columns with values(), so
+    pages come back as dicts instead of Post instances. data() then renders
+    those rows into the same output as the serializer, with every post's tags
+    fetched in one query. The result renders to the same bytes as the
+    serializer output. It skips building model instances and running DRF's
+    per-field machinery, and turns image names into URLs directly.
+    """
+    columns = ['id', 'title', 'writer', 'created_at', 'updated_at', 'comments_cnt',
+               'image', 'image_variants', 'like_cnt', 'dislike_cnt']
+    datetime_field = serializers.DateTimeField(read_only = True)
+
+    def __init__(self, context = None):
+        request = (context or {}).get("request")
+        self.absolute = request.build_absolute_uri if request is not None else None
+
+    @classmethod
+    def project(cls, queryset, *extra):
+        return queryset.prefetch_related(None).values(*cls.columns, *extra)
+
+    def url(self, name):
+        if not name:
+            return None
+        url = default_storage.url(name)
+        return self.absolute(url) if self.absolute else url
+
+    def tags(self, ids):
+        tags = defaultdict(list)
+        if ids:
+            through = Post.tag.through.objects.filter(post_id__in = ids)
+            for post_id, name in through.order_by("tag_id").values_list("post_id", "tag__name"):
+                tags[post_id].append(name)
+        return tags
+
+    def data(self, rows):
+        tags = self.tags([row["id"] for row in rows])
+        datetime = self.datetime_field.to_representation
+        return [
+            {
+                'id': row['id'],
+                'title': row['title'],
+                'writer': row['writer'],
+                'created_at': datetime(row['created_at']),
+                'updated_at': datetime(row['updated_at']),
+                'comments_cnt': row['comments_cnt'],
+                'tag': tags[row['id']],
+                'image': self.url(row['image']),
+                'thumbnail': self.url((row['image_variants'] or {}).get('thumbnail')),
+                'thumbnail_webp': self.url((row['image_variants'] or {}).get('thumbnail_webp')),
+                'like_cnt': row['like_cnt'],
+                'dislike_cnt': row['dislike_cnt'],
+            }
+            for row in rows
+        ]
 
 class TagSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Tag
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class ReactionBatchItemSerializer(serializers.Serializer):
+    post = serializers.IntegerField()
+    # null clears the user's reaction on the post
+    reaction = serializers.ChoiceField(choices=PostReaction.REACTION_CHOICES, allow_null=True)
+
+class ReactionBatchSerializer(serializers.Serializer):
+    reactions = ReactionBatchItemSerializer(many=True, allow_empty=False, max_length=100)
@@ -0,0 +1,48 @@
+"""
+post_changed fires (after commit) whenever something rendered as part of a
+post changes: the post itself, its tags, comments or reactions. Model signals
+are routed here, and views send it directly for the queryset.update() and
+bulk paths that bypass them. Caches keyed on a post listen to this one signal.
+send_post_changed also bumps the list version of post.conditional right away,
+inside the writer's transaction.
+"""
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .conditional import bump_posts_version
+from .models import Comment, Post, PostReaction
+
+post_changed = Signal()  # kwargs: post_ids
+
+
+def send_post_changed(sender, post_ids):
+    post_ids = list(post_ids)
+    bump_posts_version()
+    transaction.on_commit(lambda: post_changed.send(sender=sender, post_ids=post_ids))
+
+
+@receiver([post_save, post_delete], sender=Post)
+def post_saved(sender, instance, **kwargs):
+    send_post_changed(sender, [instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Comment)
+@receiver([post_save, post_delete], sender=PostReaction)
+def child_saved(sender, instance, **kwargs):
+    send_post_changed(sender, [instance.post_id])
+
+
+@receiver(m2m_changed, sender=Post.tag.through)
+def tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if reverse:
+        # instance is a Tag; pk_set holds post ids (None on clear)
+        post_ids = list(pk_set) if pk_set is not None else list(instance.post_set.values_list("pk", flat=True))
+    else:
+        post_ids = [instance.pk]
+    # tags are part of the body cached and validated under activity_at
+    Post.objects.filter(pk__in=post_ids).update(activity_at=timezone.now())
+    send_post_changed(sender, post_ids)
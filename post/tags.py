@@ -0,0 +1,60 @@
+import re
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Post, Tag
+from .signals import send_post_changed
+
+HASHTAG_RE = re.compile(r"#(\w+)")
+TAG_MAX_LENGTH = Tag._meta.get_field("name").max_length
+
+
+def extract_hashtags(text):
+    """Unique hashtag names in order of first appearance, without the '#'."""
+    names = dict.fromkeys(HASHTAG_RE.findall(text or ""))
+    return [name for name in names if len(name) <= TAG_MAX_LENGTH]
+
+
+def resolve_tags(names):
+    """Return {name: Tag} for names, creating the missing ones in one statement."""
+    if not names:
+        return {}
+    Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True)
+    return {tag.name: tag for tag in Tag.objects.filter(name__in=names)}
+
+
+def set_post_tags(post, names):
+    """Make post's tags exactly names, touching only the through rows that change."""
+    through = Post.tag.through
+    wanted = {tag.id for tag in resolve_tags(names).values()}
+    current = set(through.objects.filter(post_id=post.id).values_list("tag_id", flat=True))
+
+    removed = current - wanted
+    if removed:
+        through.objects.filter(post_id=post.id, tag_id__in=removed).delete()
+        Tag.objects.filter(id__in=removed).update(post_cnt=F("post_cnt") - 1)
+    added = wanted - current
+    if added:
+        through.objects.bulk_create(
+            [through(post_id=post.id, tag_id=tag_id, created_at=post.created_at) for tag_id in added],
+            ignore_conflicts=True,
+        )
+        Tag.objects.filter(id__in=added).update(post_cnt=F("post_cnt") + 1)
+    if removed or added:
+        Post.objects.filter(pk=post.id).update(activity_at=timezone.now())
+        send_post_changed(Tag, [post.id])
+
+
+def tag_posts(tag):
+    """tag's posts, with their PostTag link's columns annotated for TagPagination."""
+    return Post.objects.filter(posttag__tag=tag).annotate(
+        link_created_at=F("posttag__created_at"), link_post_id=F("posttag__post_id")
+    )
+
+
+def release_post_tags(post):
+    """Decrement the counters of post's tags; call before deleting the post."""
+    Tag.objects.filter(id__in=Post.tag.through.objects.filter(post_id=post.id).values("tag_id")).update(
+        post_cnt=F("post_cnt") - 1
+    )
@@ -1,3 +1,1643 @@
-from django.test import TestCase
+from datetime import timedelta
+from base64 import urlsafe_b64encode
+from io import BytesIO, StringIO
+import gzip
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db import OperationalError, connection
+from django.db.models import Count, F
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from . import detail_cache, leaderboard, metrics, scoring
+from .compression import CompressionMiddleware, choose_encoding
+from .paginations import KeysetPagination
+from .db import retry_on_locked
+from .images import build_variants
+from .models import *
+from .renderers import ORJSONRenderer
+from .routers import PIN_COOKIE
+from .throttles import SlidingWindowThrottle
+from .serializers import PostListProjection, PostListSerializer, PostSerializer
+from .tags import extract_hashtags, set_post_tags
+
+
+class PostQueryCountTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="tester", password="pw")
+        tags = [Tag.objects.create(name=f"tag{i}") for i in range(3)]
+        for i in range(12):
+            post = Post.objects.create(title=f"title{i}", writer="writer", content="content")
+            post.tag.set(tags, through_defaults={"created_at": post.created_at})
+            Comment.objects.create(post=post, writer=cls.user, content="comment")
+            Comment.objects.create(post=post, writer=cls.user, content="comment")
+            PostReaction.objects.create(post=post, user=cls.user, reaction="like")
+        call_command("sync_post_counters", stdout=StringIO())
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_list_query_count_is_independent_of_page_size(self):
+        # list version + count + page rows + tag prefetch
+        for page_size in (1, 5, 10):
+            with self.assertNumQueries(4):
+                response = self.client.get("/posts", {"page_size": page_size})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data["results"]), page_size)
+
+        row = response.data["results"][0]
+        self.assertEqual(row["comments_cnt"], 2)
+        self.assertEqual(row["like_cnt"], 1)
+        self.assertEqual(row["dislike_cnt"], 0)
+        self.assertEqual(sorted(row["tag"]), ["tag0", "tag1", "tag2"])
+
+    def test_recommend_query_count(self):
+        # cold leaderboard: rows + tag prefetch, then served from the cache
+        with self.assertNumQueries(2):
+            response = self.client.get("/posts/recommend")
+        self.assertEqual(len(response.data), 3)
+        with self.assertNumQueries(0):
+            self.client.get("/posts/recommend")
+
+    def test_top5_query_count(self):
+        with self.assertNumQueries(2):
+            response = self.client.get("/posts/top5")
+        self.assertEqual(len(response.data), 5)
+        with self.assertNumQueries(0):
+            self.client.get("/posts/top5")
+
+
+class PostCounterTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="tester", password="pw")
+        self.post = Post.objects.create(title="title", writer="writer", content="content")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def counters(self):
+        self.post.refresh_from_db()
+        return self.post.like_cnt, self.post.dislike_cnt, self.post.comments_cnt
+
+    def test_reaction_toggle_updates_counters(self):
+        self.client.post(f"/posts/{self.post.id}/likes")
+        self.assertEqual(self.counters(), (1, 0, 0))
+        self.client.post(f"/posts/{self.post.id}/dislikes")
+        self.assertEqual(self.counters(), (0, 1, 0))
+        self.client.post(f"/posts/{self.post.id}/dislikes")
+        self.assertEqual(self.counters(), (0, 0, 0))
+
+    def test_comment_create_and_delete_update_counter(self):
+        response = self.client.post(
+            f"/posts/{self.post.id}/comments", {"content": "hi", "writer": self.user.id}
+        )
+        self.assertEqual(self.counters(), (0, 0, 1))
+        self.client.delete(f"/comments/{response.data['id']}")
+        self.assertEqual(self.counters(), (0, 0, 0))
+
+    def test_toggle_does_not_load_tags(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(f"/posts/{self.post.id}/likes")
+        self.assertFalse([q for q in queries.captured_queries if "post_post_tag" in q["sql"]])
+        self.assertEqual(self.client.post("/posts/abc/likes").status_code, 404)
+
+    def test_sync_post_counters_fixes_drift(self):
+        PostReaction.objects.create(post=self.post, user=self.user, reaction="like")
+        Post.objects.filter(pk=self.post.pk).update(dislike_cnt=7)
+
+        etag = self.client.get(f"/posts/{self.post.pk}")["ETag"]
+        self.assertEqual(self.client.get("/posts/top5").data[0]["dislike_cnt"], 7)
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("sync_post_counters", stdout=out)
+        self.assertIn("1 post(s) and 0 tag(s)", out.getvalue())
+        self.assertEqual(self.counters(), (1, 0, 0))
+        # cached bodies, validators and leaderboards move on with the fix
+        response = self.client.get(f"/posts/{self.post.pk}", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.data["dislike_cnt"]), (200, 0))
+        self.assertEqual(self.client.get("/posts/top5").data[0]["dislike_cnt"], 0)
+
+    def test_sync_post_counters_fixes_tags_and_scores(self):
+        set_post_tags(self.post, ["django"])
+        Tag.objects.update(post_cnt=3)
+        PostReaction.objects.create(post=self.post, user=self.user, reaction="like")
+
+        out = StringIO()
+        call_command("sync_post_counters", stdout=out)
+        self.assertIn("1 post(s) and 1 tag(s)", out.getvalue())
+        self.assertEqual(Tag.objects.get().post_cnt, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.hot_score, scoring.score_of(self.post))
+
+    def test_edit_keeps_concurrent_counter_updates(self):
+        post = Post.objects.get(pk=self.post.pk)
+        Post.objects.filter(pk=post.pk).update(like_cnt=F("like_cnt") + 1)  # lands after the read
+        serializer = PostSerializer(post, data={"title": "renamed"}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertEqual(self.counters(), (1, 0, 0))
+        self.assertEqual(self.post.title, "renamed")
+
+
+class BulkImportExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="admin", password="pw")
+        cls.user = User.objects.create_user(username="tester", password="pw")
+        cls.post = Post.objects.create(title="first", writer="w", content="hello #django #python")
+        set_post_tags(cls.post, ["django", "python"])
+        Comment.objects.create(post=cls.post, writer=cls.user, content="nice")
+        PostReaction.objects.create(post=cls.post, user=cls.user, reaction="like")
+        PostReaction.objects.create(post=cls.post, user=cls.admin, reaction="dislike")
+        call_command("sync_post_counters", stdout=StringIO())
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def export(self):
+        response = self.client.get("/posts/export")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        return b"".join(response.streaming_content)
+
+    def import_(self, body):
+        response = self.client.post("/posts/import", body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_round_trip(self):
+        exported = self.export()
+        self.assertEqual([json.loads(line)["type"] for line in exported.splitlines()],
+                         ["post", "comment", "reaction", "reaction"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            report = self.import_(exported)
+        self.assertEqual(report, {"posts": 1, "comments": 1, "reactions": 2, "error_count": 0, "errors": []})
+
+        copy = Post.objects.exclude(pk=self.post.pk).get()
+        self.assertEqual((copy.title, copy.content, copy.created_at), (self.post.title, self.post.content, self.post.created_at))
+        self.assertEqual((copy.like_cnt, copy.dislike_cnt, copy.comments_cnt), (1, 1, 1))
+        self.assertEqual(sorted(copy.tag.values_list("name", flat=True)), ["django", "python"])
+        self.assertEqual(Tag.objects.get(name="django").post_cnt, 2)
+        out = StringIO()
+        call_command("sync_post_counters", dry_run=True, stdout=out)
+        self.assertIn("0 post(s) and 0 tag(s)", out.getvalue())
+
+    def test_reports_bad_rows_and_keeps_the_rest(self):
+        lines = [
+            '{"type": "post", "id": 7, "title": "ok", "writer": "w", "content": "#new"}',
+            "not json",
+            '{"type": "poll"}',
+            '{"type": "post", "title": "' + "x" * 51 + '", "writer": "w", "content": "c"}',
+            '{"type": "comment", "post": 99, "writer": "tester", "content": "c"}',
+            '{"type": "comment", "post": 7, "writer": "nobody", "content": "c"}',
+            '{"type": "reaction", "post": 7, "user": "tester", "reaction": "love"}',
+            '{"type": "reaction", "post": 7, "user": "tester", "reaction": "like"}',
+            '{"type": "reaction", "post": 7, "user": "tester", "reaction": "dislike"}',
+            '{"type": "post", "id": [1], "title": "t", "writer": "w", "content": "c"}',
+            '{"type": "comment", "post": [7], "writer": "tester", "content": "c"}',
+            '{"type": "reaction", "post": {"id": 7}, "user": "tester", "reaction": "like"}',
+            '{"type": "post", "title": "t", "writer": "w", "content": "c", "created_at": "2024-13-45T00:00:00"}',
+        ]
+        report = self.import_("\n".join(lines))
+        self.assertEqual((report["posts"], report["comments"], report["reactions"]), (1, 0, 1))
+        # reported by kind: posts, then comments, then reactions
+        errors = {error["line"]: error["error"] for error in report["errors"]}
+        self.assertEqual(sorted(errors), [2, 3, 4, 5, 6, 7, 9, 10, 11, 12, 13])
+        self.assertIn("title", errors[4])
+        self.assertIn('"id"', errors[10])
+        self.assertIn('"post"', errors[11])
+        self.assertIn('"post"', errors[12])
+        self.assertIn('"created_at"', errors[13])
+        self.assertEqual(Post.objects.get(title="ok").like_cnt, 1)
+        self.assertEqual(Tag.objects.get(name="new").post_cnt, 1)
+
+    def test_failed_batch_is_not_counted(self):
+        lines = [
+            '{"type": "post", "id": 7, "title": "ok", "writer": "w", "content": "c"}',
+            '{"type": "comment", "post": 7, "writer": "tester", "content": "c"}',
+        ]
+        with mock.patch.object(Comment.objects, "bulk_create", side_effect=DatabaseError("disk I/O error")):
+            report = self.import_("\n".join(lines))
+        self.assertEqual((report["posts"], report["comments"], report["error_count"]), (0, 0, 1))
+        self.assertIn("not imported", report["errors"][0]["error"])
+        self.assertFalse(Post.objects.filter(title="ok").exists())
+
+    def test_command_imports_in_batches(self):
+        path = os.path.join(tempfile.mkdtemp(), "posts.ndjson")
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        call_command("export_posts", output=path)
+        out = StringIO()
+        call_command("import_posts", path, batch_size=1, stdout=out)
+        self.assertEqual(json.loads(out.getvalue())["reactions"], 2)
+        self.assertEqual(Post.objects.exclude(pk=self.post.pk).get().comments_cnt, 1)
+
+    def test_admin_only(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get("/posts/export").status_code, 403)
+        self.assertEqual(self.client.post("/posts/import", "", content_type="application/x-ndjson").status_code, 403)
+
+
+class SeedDatasetTest(TestCase):
+    def test_seeded_counters_are_consistent(self):
+        out = StringIO()
+        call_command("seed_posts", posts=60, users=20, comments=200, reactions=300, stdout=out)
+        counts = json.loads(out.getvalue())
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(PostReaction.objects.count(), counts["reactions"])
+
+        out = StringIO()
+        call_command("sync_post_counters", dry_run=True, stdout=out)
+        self.assertIn("0 post(s) and 0 tag(s)", out.getvalue())
+
+    def test_load_is_skewed_and_reproducible(self):
+        call_command("seed_posts", posts=100, users=10, comments=1000, reactions=0, stdout=StringIO())
+        first = list(Post.objects.order_by("-comments_cnt").values_list("comments_cnt", flat=True))
+        # Zipf: the hottest post gets far more than its 1/100 share
+        self.assertGreater(first[0], 50)
+        with self.assertRaises(CommandError):
+            call_command("seed_posts", stdout=StringIO())
+
+        Post.objects.all().delete()
+        call_command("seed_posts", posts=100, users=10, comments=1000, reactions=0, force=True, stdout=StringIO())
+        second = list(Post.objects.order_by("-comments_cnt").values_list("comments_cnt", flat=True))
+        self.assertEqual(first, second)
+
+
+class PostListProjectionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tags = [Tag.objects.create(name=name) for name in ["b", "a", "c"]]
+        for i in range(6):
+            post = Post.objects.create(title=f"title{i}", writer="w", content="c", like_cnt=i % 3)
+            post.tag.set(tags[i % 3:], through_defaults={"created_at": post.created_at})
+        Post.objects.filter(like_cnt=1).update(
+            image="images/ab/abc.png", image_variants={"thumbnail": "images/ab/abc_320.png"},
+        )
+
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def test_matches_the_serializer_byte_for_byte(self):
+        request = Request(APIRequestFactory().get("/posts"))
+        queryset = Post.objects.prefetch_related("tag").order_by("-like_cnt", "id")
+        for context in [{"request": request}, {}]:
+            expected = PostListSerializer(queryset, many=True, context=context).data
+            rows = list(PostListProjection.project(queryset))
+            self.assertEqual(self.render(PostListProjection(context).data(rows)), self.render(expected))
+
+    def test_list_endpoint_parity(self):
+        response = self.client.get("/posts?ordering=-like_cnt&page_size=10")
+        queryset = Post.objects.prefetch_related("tag").order_by("-like_cnt")
+        expected = PostListSerializer(queryset, many=True, context={"request": response.wsgi_request}).data
+        self.assertEqual(self.render(response.data["results"]), self.render(expected))
+        self.assertIn("http://testserver/media/images/ab/abc_320.png", response.content.decode())
+
+    def test_cursor_pages_follow_projected_rows(self):
+        response = self.client.get("/posts?pagination=cursor&page_size=4")
+        second = self.client.get(response.data["next"])
+        ids = [post["id"] for post in response.data["results"] + second.data["results"]]
+        self.assertEqual(ids, list(Post.objects.order_by("-created_at", "-id").values_list("id", flat=True)))
+
+
+class LeaderboardTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create_user(username=f"user{i}", password="pw") for i in range(3)]
+        self.posts = [
+            Post.objects.create(title=f"title{i}", writer="writer", content="content")
+            for i in range(12)
+        ]
+        self.client = APIClient()
+
+    def like(self, post, user):
+        self.client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/posts/{post.id}/likes")
+
+    def top_ids(self, window="all"):
+        return [row["id"] for row in self.client.get("/posts/top5", {"window": window}).data]
+
+    def test_reactions_patch_cached_board(self):
+        self.top_ids()
+        self.like(self.posts[0], self.users[0])
+        self.like(self.posts[0], self.users[1])
+        self.like(self.posts[1], self.users[0])
+
+        with self.assertNumQueries(0):
+            ids = self.top_ids()
+        self.assertEqual(ids[:2], [self.posts[0].id, self.posts[1].id])
+        self.assertEqual(self.client.get("/posts/top5").data[0]["like_cnt"], 2)
+
+    def test_update_without_cached_boards_reads_nothing(self):
+        with self.assertNumQueries(0):
+            leaderboard.update(self.posts[0].id)
+
+    def test_post_dropping_off_full_board_is_recomputed(self):
+        self.like(self.posts[0], self.users[0])
+        self.assertEqual(self.top_ids()[0], self.posts[0].id)
+
+        self.like(self.posts[0], self.users[0])
+        self.assertEqual(self.top_ids(), sorted((p.id for p in self.posts), reverse=True)[:5])
+
+    def test_time_window(self):
+        old = self.posts[0]
+        Post.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=3))
+        self.like(old, self.users[0])
+
+        self.assertEqual(self.top_ids("all")[0], old.id)
+        self.assertEqual(self.top_ids("7d")[0], old.id)
+        self.assertNotIn(old.id, self.top_ids("24h"))
+
+    def test_unknown_window(self):
+        response = self.client.get("/posts/recommend", {"window": "1y"})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(POST_HOT_SCORE={"like": 1.0, "dislike": 1.0, "comment": 0.5, "decay_hours": 12})
+class HotScoreTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create_user(username=f"user{i}", password="pw") for i in range(3)]
+        self.posts = [
+            Post.objects.create(title=f"title{i}", writer="writer", content="content")
+            for i in range(5)
+        ]
+        self.client = APIClient()
+
+    def react(self, post, user, kind="likes"):
+        self.client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/posts/{post.id}/{kind}")
+
+    def recommend_ids(self):
+        return [row["id"] for row in self.client.get("/posts/recommend").data]
+
+    def test_score(self):
+        now = timezone.now()
+        self.assertGreater(scoring.hot_score(10, 0, 0, now), scoring.hot_score(1, 0, 0, now))
+        self.assertGreater(scoring.hot_score(1, 0, 2, now), scoring.hot_score(1, 0, 0, now))
+        self.assertLess(scoring.hot_score(0, 5, 0, now), scoring.hot_score(0, 0, 0, now))
+        # ten times the engagement makes up for decay_hours of age
+        older = now - timedelta(hours=12)
+        self.assertAlmostEqual(scoring.hot_score(100, 0, 0, older), scoring.hot_score(10, 0, 0, now))
+        self.assertLess(scoring.hot_score(99, 0, 0, older), scoring.hot_score(10, 0, 0, now))
+
+    def test_new_post_is_scored(self):
+        post = self.posts[0]
+        post.refresh_from_db()
+        # scored with the very created_at that was stored
+        self.assertEqual(post.hot_score, scoring.hot_score(0, 0, 0, post.created_at))
+
+    def test_reactions_and_comments_refresh_the_score(self):
+        post = self.posts[0]
+        self.react(post, self.users[0])
+        self.react(post, self.users[1], "dislikes")
+        self.client.force_authenticate(self.users[2])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/posts/{post.id}/comments", {"content": "hi", "writer": self.users[2].id})
+        post.refresh_from_db()
+        self.assertEqual((post.like_cnt, post.dislike_cnt, post.comments_cnt), (1, 1, 1))
+        self.assertAlmostEqual(post.hot_score, scoring.score_of(post))
+
+    def test_recommend_ranks_by_hot_score(self):
+        old, disliked = self.posts[0], self.posts[4]
+        Post.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=2))
+        scoring.refresh([old.pk])
+        self.assertEqual(self.recommend_ids(), [self.posts[4].id, self.posts[3].id, self.posts[2].id])
+
+        for user in self.users:
+            self.react(old, user)
+            self.react(disliked, user, "dislikes")
+        # three likes do not make up for two days, three dislikes sink the newest post
+        self.assertEqual(self.recommend_ids(), [self.posts[3].id, self.posts[2].id, self.posts[1].id])
+
+        for user in self.users:
+            self.react(self.posts[1], user)
+        self.assertEqual(self.recommend_ids()[0], self.posts[1].id)
+
+    def test_recommend_reads_the_index(self):
+        sql, params = Post.objects.order_by("-hot_score", "-id")[:11].query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            plan = " ".join(row[-1] for row in cursor.fetchall())
+        self.assertIn("hot_score", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_recompute_command(self):
+        Post.objects.update(hot_score=0)
+        with override_settings(POST_HOT_SCORE={"decay_hours": 24}):
+            out = StringIO()
+            call_command("recompute_hot_scores", batch_size=2, stdout=out)
+            for post in Post.objects.all():
+                self.assertAlmostEqual(post.hot_score, scoring.score_of(post))
+        self.assertIn("5 of 5 post(s) rescored", out.getvalue())
+
+
+@override_settings(POST_READ_REPLICAS=["replica"], POST_REPLICA_STICKY_SECONDS=5)
+class ReplicaRoutingTest(TestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="tester", password="pw")
+        self.post = Post.objects.create(title="title", writer="writer", content="content")
+        # the replica has caught up with the post but not with what follows
+        Post.objects.using("replica").create(id=self.post.id, title="title", writer="writer", content="content")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def like_cnt(self):
+        cache.clear()
+        return self.client.get(f"/posts/{self.post.id}").data["like_cnt"]
+
+    def test_safe_requests_read_from_the_replica(self):
+        Post.objects.create(title="unreplicated", writer="writer", content="content")
+        self.assertEqual(self.client.get("/posts").data["count"], 1)
+        with override_settings(POST_READ_REPLICAS=[]):
+            self.assertEqual(self.client.get("/posts").data["count"], 2)
+
+    def test_writes_go_to_the_primary_and_pin_the_client(self):
+        response = self.client.post(f"/posts/{self.post.id}/likes")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(Post.objects.get(pk=self.post.id).like_cnt, 1)
+        self.assertEqual(Post.objects.using("replica").get(pk=self.post.id).like_cnt, 0)
+        # the client reads its own like from the primary
+        self.assertEqual(self.like_cnt(), 1)
+
+        other = APIClient()
+        cache.clear()
+        self.assertEqual(other.get(f"/posts/{self.post.id}").data["like_cnt"], 0)
+
+    def test_replica_reads_do_not_fill_shared_caches(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/posts/{self.post.id}/likes")
+        other = APIClient()
+        self.assertEqual(other.get(f"/posts/{self.post.id}").data["like_cnt"], 0)
+        self.assertEqual(other.get("/posts/top5").data[0]["like_cnt"], 0)
+        # no cache.clear(): the pinned client must not get what the replica read
+        self.assertEqual(self.client.get(f"/posts/{self.post.id}").data["like_cnt"], 1)
+        self.assertEqual(self.client.get("/posts/top5").data[0]["like_cnt"], 1)
+
+    def test_list_validators_follow_the_replica(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/posts/{self.post.id}/likes")
+        other = APIClient()
+        response = other.get("/posts")
+        self.assertEqual(response.data["results"][0]["like_cnt"], 0)
+
+        # the replica catches up, list version included
+        Post.objects.using("replica").filter(pk=self.post.id).update(like_cnt=1)
+        PostListVersion.objects.using("replica").update(version=F("version") + 1)
+        response = other.get("/posts", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["like_cnt"], 1)
+
+    def test_pin_expires(self):
+        with override_settings(POST_REPLICA_STICKY_SECONDS=0):
+            self.client.post(f"/posts/{self.post.id}/likes")
+        self.assertEqual(self.like_cnt(), 0)
+
+    def test_safe_requests_do_not_pin(self):
+        response = self.client.get("/posts")
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+@override_settings(POST_READ_REPLICAS=["replica"])
+class SyncReplicaTest(TransactionTestCase):
+    # TestCase's open transactions would block the SQLite backup
+    databases = {"default", "replica"}
+
+    def test_copies_the_primary(self):
+        Post.objects.create(title="title", writer="writer", content="content")
+        self.assertEqual(Post.objects.using("replica").count(), 0)
+        call_command("sync_replica", stdout=StringIO())
+        self.assertEqual(Post.objects.using("replica").count(), 1)
+
+    def test_unknown_alias(self):
+        with self.assertRaises(CommandError):
+            call_command("sync_replica", "default", stdout=StringIO())
+
+
+class ReactionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="tester", password="pw")
+        self.posts = [
+            Post.objects.create(title=f"title{i}", writer="writer", content="content")
+            for i in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def counters(self, post):
+        post.refresh_from_db()
+        return post.like_cnt, post.dislike_cnt
+
+    def test_duplicate_reaction_rejected(self):
+        PostReaction.objects.create(post=self.posts[0], user=self.user, reaction="like")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            PostReaction.objects.create(post=self.posts[0], user=self.user, reaction="dislike")
+
+    def test_anonymous_cannot_react(self):
+        self.client.force_authenticate(None)
+        response = self.client.post(f"/posts/{self.posts[0].id}/dislikes")
+        self.assertEqual(response.status_code, 403)
+
+    def test_batch_sets_reactions(self):
+        PostReaction.objects.create(post=self.posts[1], user=self.user, reaction="like")
+        Post.objects.filter(pk=self.posts[1].pk).update(like_cnt=1)
+        PostReaction.objects.create(post=self.posts[2], user=self.user, reaction="like")
+        Post.objects.filter(pk=self.posts[2].pk).update(like_cnt=1)
+
+        payload = {"reactions": [
+            {"post": self.posts[0].id, "reaction": "dislike"},
+            {"post": self.posts[0].id, "reaction": "like"},
+            {"post": self.posts[1].id, "reaction": "dislike"},
+            {"post": self.posts[2].id, "reaction": None},
+            {"post": 9999, "reaction": "like"},
+        ]}
+        response = self.client.post("/posts/reactions", payload, format="json")
+        self.assertEqual(response.data, {"applied": 3, "missing": [9999]})
+        self.assertEqual(self.counters(self.posts[0]), (1, 0))
+        self.assertEqual(self.counters(self.posts[1]), (0, 1))
+        self.assertEqual(self.counters(self.posts[2]), (0, 0))
+        self.assertEqual(
+            dict(PostReaction.objects.values_list("post", "reaction")),
+            {self.posts[0].id: "like", self.posts[1].id: "dislike"},
+        )
+
+        # replaying the same queue changes nothing
+        response = self.client.post("/posts/reactions", payload, format="json")
+        self.assertEqual(response.data["applied"], 0)
+        self.assertEqual(self.counters(self.posts[0]), (1, 0))
+
+
+@override_settings(POST_THROTTLE_RATES={
+    "reaction": {"user": "2/min", "ip": "3/min"},
+    "comment": {"user": "1/min", "ip": None},
+})
+class ThrottleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create_user(username=f"user{i}", password="pw") for i in range(2)]
+        self.post = Post.objects.create(title="title", writer="writer", content="content")
+        self.client = APIClient()
+
+    def like(self, user):
+        self.client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(f"/posts/{self.post.id}/likes")
+
+    def test_user_and_ip_limits(self):
+        self.assertEqual(self.like(self.users[0]).status_code, 200)
+        self.assertEqual(self.like(self.users[0]).status_code, 200)
+        response = self.like(self.users[0])
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+
+        # another user has their own limit but shares the client IP's
+        self.assertEqual(self.like(self.users[1]).status_code, 200)
+        self.assertEqual(self.like(self.users[1]).status_code, 429)
+        self.assertEqual(self.client.get("/posts").status_code, 200)
+
+    def test_throttled_requests_do_not_write(self):
+        for _ in range(3):
+            self.like(self.users[0])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_cnt, 0)  # liked, unliked, then throttled
+
+    def test_comment_create(self):
+        self.client.force_authenticate(self.users[0])
+        url = f"/posts/{self.post.id}/comments"
+        self.assertEqual(self.client.post(url, {"content": "a", "writer": self.users[0].id}).status_code, 200)
+        self.assertEqual(self.client.post(url, {"content": "b", "writer": self.users[0].id}).status_code, 429)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(Comment.objects.count(), 1)
+
+    @override_settings(POST_THROTTLE_RATES={"reaction": {"user": "10/min"}})
+    def test_sliding_window(self):
+        class View:
+            action = "likes"
+            throttle_scopes = {"likes": "reaction"}
+
+        request = Request(APIRequestFactory().post("/"))
+        request.user = self.users[0]
+        throttle = SlidingWindowThrottle()
+        throttle.timer = lambda: now
+
+        now = 30
+        for _ in range(10):
+            self.assertTrue(throttle.allow_request(request, View()))
+        self.assertFalse(throttle.allow_request(request, View()))
+        self.assertEqual(throttle.wait(), 36)
+        # one second into the next window, 59/60 of the last ten still count
+        now = 61
+        self.assertFalse(throttle.allow_request(request, View()))
+        self.assertEqual(throttle.wait(), 5)
+        now = 66
+        self.assertTrue(throttle.allow_request(request, View()))
+        self.assertFalse(throttle.allow_request(request, View()))
+
+
+class CursorPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="tester", password="pw")
+        cls.posts = [
+            Post.objects.create(title=f"title{i}", writer="writer", content="content", like_cnt=i % 3)
+            for i in range(13)
+        ]
+        for i in range(7):
+            Comment.objects.create(post=cls.posts[0], writer=cls.user, content=f"comment{i}")
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def walk(self, url, params):
+        ids, pages = [], 0
+        response = self.client.get(url, params)
+        while True:
+            pages += 1
+            ids += [row["id"] for row in response.data["results"]]
+            if not response.data["next"]:
+                return ids, pages, response
+            response = self.client.get(response.data["next"])
+
+    def test_walks_posts_by_created_at(self):
+        # list version + page rows + tag prefetch; the paginator does not count
+        with self.assertNumQueries(3):
+            self.client.get("/posts", {"pagination": "cursor"})
+
+        ids, pages, last = self.walk("/posts", {"pagination": "cursor", "page_size": 5})
+        self.assertEqual(ids, [p.id for p in reversed(self.posts)])
+        self.assertEqual(pages, 3)
+
+        previous = self.client.get(last.data["previous"])
+        self.assertEqual(
+            [row["id"] for row in previous.data["results"]], ids[5:10]
+        )
+
+    def test_walks_posts_by_like_count_with_ties(self):
+        ids, pages, _ = self.walk("/posts", {"pagination": "cursor", "ordering": "-like_cnt"})
+        expected = sorted(self.posts, key=lambda p: (-p.like_cnt, -p.id))
+        self.assertEqual(ids, [p.id for p in expected])
+
+    def test_page_number_pagination_stays_default(self):
+        response = self.client.get("/posts")
+        self.assertEqual(response.data["count"], 13)
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/posts", {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 404)
+        for position in ([None, 1], [[1], 1], [{"a": 1}, 1]):
+            token = urlsafe_b64encode(json.dumps({"p": position, "r": 0}).encode()).decode()
+            self.assertEqual(self.client.get("/posts", {"cursor": token}).status_code, 404, position)
+
+    def test_cursor_pages_seek_the_index(self):
+        for ordering, index in [("-created_at", "post_created_at_id_idx"), ("-like_cnt", "post_like_cnt_id_idx")]:
+            keys = [ordering, "-id"]
+            queryset = Post.objects.filter(KeysetPagination.after(keys, [getattr(self.posts[5], ordering[1:]), self.posts[5].id]))
+            sql, params = queryset.order_by(*keys).values("id")[:6].query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+                plan = " ".join(row[-1] for row in cursor.fetchall())
+            # a range seek, not a scan of every row before the cursor
+            self.assertIn(f"SEARCH post_post USING COVERING INDEX {index} (", plan)
+            self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_walks_comments(self):
+        self.client.force_authenticate(self.user)
+        ids, pages, _ = self.walk(
+            f"/posts/{self.posts[0].id}/comments", {"pagination": "cursor", "page_size": 3}
+        )
+        self.assertEqual(len(ids), 7)
+        self.assertEqual(len(set(ids)), 7)
+        self.assertEqual(pages, 3)
+
+
+class PostSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.django = Post.objects.create(title="django tips", writer="kim", content="orm and django views")
+        cls.drf = Post.objects.create(title="serializers", writer="lee", content="drf with django #python")
+        cls.other = Post.objects.create(title="cooking", writer="park", content="pasta recipe #python")
+        tag = Tag.objects.create(name="python")
+        cls.drf.tag.add(tag, through_defaults={"created_at": cls.drf.created_at})
+        cls.other.tag.add(tag, through_defaults={"created_at": cls.other.created_at})
+
+    def search(self, query, **params):
+        response = self.client.get("/posts", {"search": query, **params})
+        return [row["id"] for row in response.data["results"]]
+
+    def test_ranked_full_text_match(self):
+        self.assertEqual(self.search("django"), [self.django.id, self.drf.id])
+
+    def test_prefix_and_writer_match(self):
+        self.assertEqual(self.search("recip"), [self.other.id])
+        self.assertEqual(self.search("lee"), [self.drf.id])
+
+    def test_terms_are_anded(self):
+        self.assertEqual(self.search("django orm"), [self.django.id])
+
+    def test_tag_filters(self):
+        self.assertEqual(self.search("#python django"), [self.drf.id])
+        self.assertEqual(sorted(self.search("python")), [self.drf.id, self.other.id])
+
+    def test_explicit_ordering_overrides_rank(self):
+        ids = self.search("django", ordering="-created_at")
+        self.assertEqual(ids, [self.drf.id, self.django.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.other.content = "django pasta"
+        self.other.save()
+        self.assertIn(self.other.id, self.search("django"))
+        self.django.delete()
+        self.assertNotIn(self.django.id, self.search("django"))
+
+    def test_operators_in_input_are_literal(self):
+        self.assertEqual(self.search('django" OR "cooking'), [])
+
+
+class HashtagTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def tags(self, post_id):
+        return set(Post.objects.get(pk=post_id).tag.values_list("name", flat=True))
+
+    def test_extract_hashtags(self):
+        self.assertEqual(
+            extract_hashtags("hello  #django, #drf!  #django #한글 # #" + "x" * 51),
+            ["django", "drf", "한글"],
+        )
+
+    def test_create_resolves_tags_in_constant_queries(self):
+        Tag.objects.create(name="tag0")
+        content = " ".join(f"#tag{i}" for i in range(20))
+        # includes the feed fan-out's follower lookup, the activity_at bump
+        # for the new tags and the two list version bumps (post, tags)
+        with self.assertNumQueries(12):
+            response = self.client.post(
+                "/posts", {"title": "t", "writer": "w", "content": "x  " + content}
+            )
+        self.assertEqual(self.tags(response.data["id"]), {f"tag{i}" for i in range(20)})
+        self.assertEqual(Tag.objects.count(), 20)
+
+    def test_update_applies_tag_diff(self):
+        response = self.client.post("/posts", {"title": "t", "writer": "w", "content": "#a #b #c"})
+        post_id = response.data["id"]
+        through = Post.tag.through
+        kept = through.objects.get(post_id=post_id, tag__name="a").pk
+
+        self.client.patch(f"/posts/{post_id}", {"content": "#a #d"})
+        self.assertEqual(self.tags(post_id), {"a", "d"})
+        self.assertEqual(through.objects.get(post_id=post_id, tag__name="a").pk, kept)
+
+
+class RenderingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser(username="admin", password="pw")
+        self.posts = [
+            Post.objects.create(title=f"title{i}", writer="writer", content="글 \u2028 " + "x" * 400)
+            for i in range(5)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_orjson_renders_the_same_bytes(self):
+        for url in ["/posts", f"/posts/{self.posts[0].id}", "/posts/recommend"]:
+            data = self.client.get(url).data
+            self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data), url)
+        response = self.client.get("/posts", HTTP_ACCEPT="application/json; indent=2")
+        self.assertIn(b'\n  "count"', response.content)
+
+    def test_json_requests_are_parsed(self):
+        response = self.client.post(
+            "/posts/reactions", {"reactions": [{"post": self.posts[0].id, "reaction": "like"}]}, format="json"
+        )
+        self.assertEqual(response.data["applied"], 1)
+        response = self.client.post("/posts/reactions", b'{"reactions": [', content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_large_responses_are_compressed(self):
+        plain = self.client.get("/posts")
+        self.assertFalse(plain.has_header("Content-Encoding"))
+        response = self.client.get("/posts", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertLess(len(response.content), len(plain.content))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_small_responses_are_not_compressed(self):
+        response = self.client.get("/posts/999", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_compressed_etag_still_revalidates(self):
+        response = self.client.get("/posts", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertTrue(response["ETag"].startswith('W/"'))
+        response = self.client.get("/posts", HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_streamed_export_is_compressed(self):
+        response = self.client.get("/posts/export", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        lines = gzip.decompress(b"".join(response.streaming_content)).splitlines()
+        self.assertEqual(len(lines), 5)
+
+    def test_choose_encoding(self):
+        self.assertEqual(choose_encoding("gzip, br", ["br", "gzip"]), "br")
+        self.assertEqual(choose_encoding("gzip;q=1, br;q=0.5", ["br", "gzip"]), "gzip")
+        self.assertEqual(choose_encoding("br;q=0, *", ["br", "gzip"]), "gzip")
+        self.assertIsNone(choose_encoding("gzip;q=0", ["gzip"]))
+        self.assertIsNone(choose_encoding("", ["br", "gzip"]))
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="tester", password="pw")
+        self.post = Post.objects.create(title="title", writer="writer", content="#tag")
+        self.post.tag.add(Tag.objects.create(name="tag"), through_defaults={"created_at": self.post.created_at})
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertRevalidates(self, url, change=None, queries=1):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertTrue(response.has_header("Last-Modified"))
+
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        if change is not None:
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+
+    def test_post_list(self):
+        # lists validate against the PostListVersion row alone
+        self.assertRevalidates("/posts", lambda: Post.objects.create(title="new", writer="w", content="c"))
+
+    def test_post_list_version_needs_no_signal_receiver(self):
+        # another worker never runs this process's post_changed receivers
+        etag = self.client.get("/posts")["ETag"]
+        with self.captureOnCommitCallbacks(execute=False):
+            Post.objects.create(title="new", writer="w", content="c")
+        self.assertEqual(self.client.get("/posts", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_post_list_sees_deletes(self):
+        Post.objects.create(title="old", writer="w", content="c")
+        self.assertRevalidates("/posts", lambda: Post.objects.filter(title="old").delete())
+
+    def test_post_detail_invalidated_by_reaction(self):
+        self.assertRevalidates(
+            f"/posts/{self.post.id}", lambda: self.client.post(f"/posts/{self.post.id}/likes")
+        )
+
+    def test_comments_invalidated_by_comment(self):
+        self.assertRevalidates(
+            f"/posts/{self.post.id}/comments",
+            lambda: self.client.post(
+                f"/posts/{self.post.id}/comments", {"content": "hi", "writer": self.user.id}
+            ),
+        )
+
+    def test_tag_page(self):
+        self.assertRevalidates("/tags/tag", lambda: self.client.post(f"/posts/{self.post.id}/dislikes"))
+
+    def test_if_modified_since(self):
+        response = self.client.get(f"/posts/{self.post.id}")
+        response = self.client.get(
+            f"/posts/{self.post.id}", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_unknown_post_still_404s(self):
+        self.assertEqual(self.client.get("/posts/999").status_code, 404)
+
+
+class DetailCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="tester", password="pw")
+        self.post = Post.objects.create(title="title", writer="writer", content="content")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def detail(self):
+        return self.client.get(f"/posts/{self.post.id}").data
+
+    def test_second_read_is_served_from_cache(self):
+        self.detail()
+        before = detail_cache.stats()["hits"]
+        with self.assertNumQueries(1):  # only the conditional-GET validator
+            self.detail()
+        self.assertEqual(detail_cache.stats()["hits"], before + 1)
+
+    def test_comment_and_reaction_invalidate(self):
+        self.detail()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/posts/{self.post.id}/comments", {"content": "hi", "writer": self.user.id})
+        self.assertEqual(len(self.detail()["comments"]), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/posts/{self.post.id}/likes")
+        self.assertEqual(self.detail()["like_cnt"], 1)
+
+    def test_zero_padded_ids_are_invalidated_too(self):
+        self.assertEqual(self.client.get(f"/posts/0{self.post.id}").data["title"], "title")
+        self.client.force_authenticate(User.objects.create_superuser(username="admin", password="pw"))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f"/posts/{self.post.id}", {"title": "renamed"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(f"/posts/0{self.post.id}").data["title"], "renamed")
+
+    def test_entries_follow_activity_at_without_signals(self):
+        # a worker that never ran this process's post_changed receivers,
+        # or a read between the commit and the on_commit callbacks
+        self.detail()
+        with self.captureOnCommitCallbacks(execute=False):
+            self.client.post(f"/posts/{self.post.id}/likes")
+        self.assertEqual(self.detail()["like_cnt"], 1)
+
+    def test_model_changes_invalidate(self):
+        self.detail()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.title = "renamed"
+            self.post.save()
+        self.assertEqual(self.detail()["title"], "renamed")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.tag.add(Tag.objects.create(name="fresh"), through_defaults={"created_at": self.post.created_at})
+        self.assertEqual(self.detail()["tag"], ["fresh"])
+
+    @override_settings(POST_DETAIL_CACHE_LOCK_WAIT=2)
+    def test_cold_key_is_built_once(self):
+        calls = []
+
+        def build():
+            calls.append(1)
+            time.sleep(0.2)
+            return {"id": 1}
+
+        threads = [
+            threading.Thread(target=detail_cache.get_or_build, args=(12345, "2024-01-01T00:00:00", "v", build))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+
+
+class DetailCommentsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="tester", password="pw")
+        self.post = Post.objects.create(title="title", writer="writer", content="content")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_comments(self, n):
+        Comment.objects.bulk_create(
+            [Comment(post=self.post, writer=self.user, content=f"c{i}") for i in range(n)]
+        )
+
+    def test_small_posts_embed_everything(self):
+        self.add_comments(3)
+        data = self.client.get(f"/posts/{self.post.id}").data
+        self.assertEqual(len(data["comments"]), 3)
+        self.assertIsNone(data["comments_next"])
+
+    @override_settings(POST_DETAIL_COMMENTS=10)
+    def test_large_posts_link_to_remaining_comments(self):
+        self.add_comments(15)
+        data = self.client.get(f"/posts/{self.post.id}").data
+        self.assertEqual(len(data["comments"]), 10)
+        self.assertEqual(data["comments"][0]["post"], "title")
+
+        rest = self.client.get(data["comments_next"]).data
+        embedded = [c["id"] for c in data["comments"]]
+        self.assertEqual(len(rest["results"]), 5)
+        self.assertIsNone(rest["next"])
+        self.assertFalse(set(embedded) & {c["id"] for c in rest["results"]})
+
+    def test_detail_queries_do_not_grow_with_comments(self):
+        self.add_comments(5)
+        with self.assertNumQueries(4) as small:
+            self.client.get(f"/posts/{self.post.id}")
+        cache.clear()
+        self.add_comments(50)
+        with self.assertNumQueries(len(small)):
+            self.client.get(f"/posts/{self.post.id}")
+
+    def test_comment_list_resolves_post_title_once(self):
+        self.add_comments(20)
+        with self.assertNumQueries(2):  # validator + comments joined with their post
+            response = self.client.get(f"/posts/{self.post.id}/comments")
+        self.assertEqual(len(response.data), 20)
+
+
+class TagPageTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(username="admin", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def create(self, content):
+        return self.client.post("/posts", {"title": "t", "writer": "w", "content": content}).data["id"]
+
+    def post_cnt(self, name):
+        return Tag.objects.get(name=name).post_cnt
+
+    def test_post_cnt_follows_tag_changes(self):
+        first = self.create("#a #b")
+        self.create("#a")
+        self.assertEqual((self.post_cnt("a"), self.post_cnt("b")), (2, 1))
+
+        self.client.patch(f"/posts/{first}", {"content": "#b #c"})
+        self.assertEqual((self.post_cnt("a"), self.post_cnt("b"), self.post_cnt("c")), (1, 1, 1))
+
+        self.client.delete(f"/posts/{first}")
+        self.assertEqual((self.post_cnt("a"), self.post_cnt("b"), self.post_cnt("c")), (1, 0, 0))
+
+    def test_tag_page_is_cursor_paginated_list(self):
+        ids = [self.create("#popular") for _ in range(7)]
+        self.create("#other")
+
+        # list version + tag lookup + page rows + tag prefetch, whatever the tag's size
+        with self.assertNumQueries(4):
+            data = self.client.get("/tags/popular").data
+        self.assertEqual((data["name"], data["post_cnt"]), ("popular", 7))
+        self.assertEqual([row["id"] for row in data["results"]], ids[::-1][:5])
+        self.assertIn("comments_cnt", data["results"][0])
+        self.assertNotIn("comments", data["results"][0])
+
+        rest = self.client.get(data["next"]).data
+        self.assertEqual([row["id"] for row in rest["results"]], ids[::-1][5:])
+
+    def test_unknown_tag(self):
+        self.assertEqual(self.client.get("/tags/missing").status_code, 404)
+
+    def test_sync_fixes_tag_drift(self):
+        self.create("#a")
+        Tag.objects.filter(name="a").update(post_cnt=5)
+        call_command("sync_post_counters", stdout=StringIO())
+        self.assertEqual(self.post_cnt("a"), 1)
+
+
+class FeedTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(username="admin", password="pw")
+        self.users = [User.objects.create_user(username=f"user{i}", password="pw") for i in range(3)]
+        self.client = APIClient()
+
+    def create(self, content):
+        self.client.force_authenticate(self.admin)
+        return self.client.post("/posts", {"title": "t", "writer": "w", "content": content}).data["id"]
+
+    def follow(self, user, name, method="post"):
+        self.client.force_authenticate(user)
+        return getattr(self.client, method)(f"/tags/{name}/follow")
+
+    def feed(self, user, **params):
+        self.client.force_authenticate(user)
+        ids, response = [], self.client.get("/feed", params)
+        while True:
+            ids += [row["id"] for row in response.data["results"]]
+            if not response.data["next"]:
+                return ids
+            response = self.client.get(response.data["next"])
+
+    def test_follow_backfills_and_new_posts_fan_out(self):
+        old = self.create("#django old")
+        self.create("#flask other")
+        response = self.follow(self.users[0], "django")
+        self.assertEqual(response.data, {"name": "django", "following": True, "follower_cnt": 1})
+        self.assertEqual(self.feed(self.users[0]), [old])
+
+        new = self.create("#django new")
+        self.assertEqual(self.feed(self.users[0]), [new, old])
+        self.assertEqual(self.feed(self.users[1]), [])
+
+    def test_feed_rows_match_the_post_list(self):
+        post_id = self.create("#django hello")
+        self.follow(self.users[0], "django")
+        row = self.client.get("/feed").data["results"][0]
+        self.assertEqual(row, self.client.get("/posts").data["results"][0])
+        self.assertEqual(row["id"], post_id)
+
+    def test_untagging_and_unfollowing_remove_entries(self):
+        both = self.create("#django #drf both")
+        only = self.create("#django only")
+        self.follow(self.users[0], "django")
+        self.follow(self.users[0], "drf")
+
+        self.client.force_authenticate(self.admin)
+        self.client.patch(f"/posts/{only}", {"content": "no tags"})
+        self.assertEqual(self.feed(self.users[0]), [both])
+
+        response = self.follow(self.users[0], "django", "delete")
+        self.assertEqual(response.data["follower_cnt"], 0)
+        # still followed through #drf
+        self.assertEqual(self.feed(self.users[0]), [both])
+        self.follow(self.users[0], "drf", "delete")
+        self.assertEqual(self.feed(self.users[0]), [])
+        self.assertFalse(FeedEntry.objects.exists())
+
+    def test_cursor_pages(self):
+        ids = [self.create(f"#django post{i}") for i in range(7)]
+        self.follow(self.users[0], "django")
+        self.assertEqual(self.feed(self.users[0], page_size=3), ids[::-1])
+
+        first = self.client.get("/feed", {"page_size": 3})
+        second = self.client.get(first.data["next"])
+        previous = self.client.get(second.data["previous"])
+        self.assertEqual(previous.data["results"], first.data["results"])
+
+    @override_settings(POST_FEED_FANOUT_LIMIT=2)
+    def test_popular_tags_are_merged_at_read_time(self):
+        Tag.objects.bulk_create([Tag(name="big"), Tag(name="small")])
+        self.follow(self.users[1], "big")
+        self.follow(self.users[2], "big")
+        ids = [self.create(content) for content in ["#big a", "#small b", "#big #small c", "#big d", "#small e"]]
+        self.follow(self.users[0], "big")
+        self.follow(self.users[0], "small")
+        # #big has too many followers to be fanned out
+        self.assertFalse(FeedEntry.objects.filter(post__tag__name="big").exclude(post__tag__name="small").exists())
+
+        self.assertEqual(self.feed(self.users[0], page_size=2), ids[::-1])
+        self.assertEqual(self.feed(self.users[1]), [ids[3], ids[2], ids[0]])
+
+    def test_feed_is_an_index_range_read(self):
+        queryset = FeedEntry.objects.filter(user=self.users[0]).order_by("-created_at", "-post_id")
+        sql, params = queryset.values_list("created_at", "post_id")[:6].query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            plan = " ".join(row[-1] for row in cursor.fetchall())
+        self.assertIn("feed_user_created_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_requires_login(self):
+        self.assertEqual(APIClient().get("/feed").status_code, 403)
+        self.assertEqual(APIClient().post("/tags/django/follow").status_code, 403)
+
+
+class ArchiveTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="tester", password="pw")
+        self.client = APIClient()
+        # a session login, so the /async/ endpoints see the user too
+        self.client.force_login(self.user)
+        self.old = self.create("archived django post", "#django")
+        self.new = self.create("recent django post", "#django")
+        self.backdate(self.old, days=400)
+
+    def create(self, title, content):
+        post = Post.objects.create(title=title, writer="w", content=content)
+        set_post_tags(post, extract_hashtags(content))
+        return post
+
+    def backdate(self, post, days):
+        when = timezone.now() - timedelta(days=days)
+        Post.objects.filter(pk=post.pk).update(created_at=when, activity_at=when)
+
+    def archive(self, *args):
+        out = StringIO()
+        call_command("archive_posts", *args, stdout=out)
+        cache.clear()
+        return out.getvalue()
+
+    @override_settings(POST_DETAIL_COMMENTS=10)
+    def test_detail_and_comments_render_as_before(self):
+        Comment.objects.bulk_create(
+            [Comment(post=self.old, writer=self.user, content=f"c{i}") for i in range(15)]
+        )
+        Post.objects.filter(pk=self.old.pk).update(comments_cnt=15)
+        self.client.post(f"/posts/{self.old.id}/likes")
+        self.backdate(self.old, days=400)
+        urls = [f"/posts/{self.old.id}", f"/posts/{self.old.id}/comments",
+                f"/posts/{self.old.id}/comments?pagination=cursor", f"/async/posts/{self.old.id}"]
+        before = [self.client.get(url).content for url in urls]
+        rest = self.client.get(json.loads(before[0])["comments_next"]).content
+
+        self.assertIn("1 post(s), 15 comment(s) and 1 reaction(s)", self.archive())
+        self.assertFalse(Post.objects.filter(pk=self.old.pk).exists())
+        self.assertEqual([self.client.get(url).content for url in urls], before)
+        self.assertEqual(self.client.get(json.loads(before[0])["comments_next"]).content, rest)
+        self.assertEqual(self.client.get(f"/async/posts/{self.old.id}/comments").json(),
+                         json.loads(before[1]))
+
+    def test_summary_counts_are_recounted(self):
+        Comment.objects.create(post=self.old, writer=self.user, content="c")
+        PostReaction.objects.create(post=self.old, user=self.user, reaction="dislike")
+        Post.objects.filter(pk=self.old.pk).update(like_cnt=5)  # drifted
+        self.backdate(self.old, days=400)
+        self.archive()
+        archived = ArchivedPost.objects.get(pk=self.old.pk)
+        self.assertEqual((archived.like_cnt, archived.dislike_cnt, archived.comments_cnt), (0, 1, 1))
+        self.assertEqual(archived.tags, ["django"])
+        self.assertEqual(ArchivedReaction.objects.get().reaction, "dislike")
+
+    def test_list_search_and_leaderboards_only_see_hot_posts(self):
+        self.assertEqual(self.client.get("/posts/top5").data[-1]["id"], self.old.id)
+        self.archive()
+        ids = lambda response: [row["id"] for row in response.data["results"]]
+        self.assertEqual(ids(self.client.get("/posts")), [self.new.id])
+        self.assertEqual(ids(self.client.get("/posts", {"search": "django"})), [self.new.id])
+        self.assertEqual(ids(self.client.get("/tags/django")), [self.new.id])
+        self.assertEqual(Tag.objects.get(name="django").post_cnt, 1)
+        self.assertEqual([row["id"] for row in self.client.get("/posts/top5").data], [self.new.id])
+
+    def test_archived_posts_are_read_only(self):
+        self.archive()
+        self.assertEqual(self.client.post(f"/posts/{self.old.id}/likes").status_code, 404)
+        response = self.client.post(f"/posts/{self.old.id}/comments", {"content": "late"})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get("/posts/999").status_code, 404)
+
+    def test_only_old_and_inactive_posts_move(self):
+        stale_but_active = self.create("old but discussed", "content")
+        self.backdate(stale_but_active, days=400)
+        Post.objects.filter(pk=stale_but_active.pk).update(activity_at=timezone.now())
+
+        self.assertIn("1 post(s)", self.archive("--dry-run"))
+        self.assertEqual(Post.objects.count(), 3)
+        self.assertIn("0 post(s)", self.archive("--days", "500"))
+        self.archive()
+        self.assertEqual(set(Post.objects.values_list("pk", flat=True)), {self.new.pk, stale_but_active.pk})
+
+    def test_hot_comment_list_queries_are_unchanged(self):
+        Comment.objects.create(post=self.new, writer=self.user, content="c")
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.assertNumQueries(2):
+            client.get(f"/posts/{self.new.id}/comments")
+
+
+class ImageUploadTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        overrides = override_settings(MEDIA_ROOT=self.media, POST_IMAGE_SYNC=True)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.admin = User.objects.create_superuser(username="admin", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def upload(self, color="red"):
+        buffer = BytesIO()
+        Image.new("RGB", (1200, 800), color).save(buffer, format="JPEG")
+        image = SimpleUploadedFile("photo.JPG", buffer.getvalue(), content_type="image/jpeg")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/posts", {"title": "t", "writer": "w", "content": "c", "image": image}
+            )
+        return Post.objects.get(pk=response.data["id"])
+
+    def test_upload_is_stored_once_by_content_hash(self):
+        first, second = self.upload(), self.upload()
+        other = self.upload("blue")
+
+        self.assertTrue(first.image.name.startswith("images/"))
+        self.assertTrue(first.image.name.endswith(".jpg"))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        self.assertEqual(len(default_storage.listdir(first.image.name.rsplit("/", 1)[0])[1]), 3)
+
+    def test_variants_are_built_and_listed(self):
+        post = self.upload()
+        self.assertEqual(set(post.image_variants), {"thumbnail", "thumbnail_webp"})
+        with default_storage.open(post.image_variants["thumbnail_webp"]) as f:
+            thumb = Image.open(f)
+            self.assertEqual((thumb.format, max(thumb.size)), ("WEBP", 320))
+
+        row = self.client.get("/posts").data["results"][0]
+        self.assertTrue(row["thumbnail"].endswith(post.image_variants["thumbnail"]))
+        self.assertTrue(row["thumbnail_webp"].startswith("http://testserver/media/images/"))
+
+    def test_build_image_variants_backfills_old_posts(self):
+        buffer = BytesIO()
+        Image.new("RGB", (800, 800), "green").save(buffer, format="PNG")
+        name = default_storage.save("7/stillcut.png", BytesIO(buffer.getvalue()))
+        post = Post.objects.create(title="t", writer="w", content="c", image=name)
+
+        call_command("build_image_variants", stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants["thumbnail"], "7/stillcut_320.png")
+
+    def test_variants_revalidate_cached_details(self):
+        buffer = BytesIO()
+        Image.new("RGB", (800, 800), "green").save(buffer, format="PNG")
+        name = default_storage.save("7/stillcut.png", BytesIO(buffer.getvalue()))
+        post = Post.objects.create(title="t", writer="w", content="c", image=name)
+        Post.objects.filter(pk=post.pk).update(activity_at=timezone.now() - timedelta(minutes=1))
+        before = self.client.get(f"/posts/{post.id}")
+        self.assertIsNone(before.data["thumbnail"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            build_variants(name)
+        after = self.client.get(f"/posts/{post.id}", HTTP_IF_NONE_MATCH=before["ETag"])
+        self.assertEqual(after.status_code, 200)
+        self.assertTrue(after.data["thumbnail"].endswith("7/stillcut_320.png"))
+
+    def test_webp_variants_keep_transparency(self):
+        buffer = BytesIO()
+        Image.new("RGBA", (800, 800), (0, 255, 0, 0)).save(buffer, format="PNG")
+        name = default_storage.save("7/clear.png", BytesIO(buffer.getvalue()))
+        buffer = BytesIO()
+        Image.new("P", (800, 800)).save(buffer, format="GIF", transparency=0)
+        gif = default_storage.save("7/clear.gif", BytesIO(buffer.getvalue()))
+
+        for variants in (build_variants(name), build_variants(gif)):
+            with default_storage.open(variants["thumbnail_webp"]) as f:
+                self.assertEqual(Image.open(f).mode, "RGBA")
+
+    def test_variants_refresh_cached_leaderboards(self):
+        buffer = BytesIO()
+        Image.new("RGB", (800, 800), "green").save(buffer, format="PNG")
+        name = default_storage.save("7/stillcut.png", BytesIO(buffer.getvalue()))
+        Post.objects.create(title="t", writer="w", content="c", image=name)
+        self.assertIsNone(self.client.get("/posts/top5").data[0]["thumbnail"])
+
+        build_variants(name)
+        self.assertTrue(self.client.get("/posts/top5").data[0]["thumbnail"].endswith("7/stillcut_320.png"))
+
+    def test_post_without_image_has_no_thumbnail(self):
+        self.client.post("/posts", {"title": "t", "writer": "w", "content": "c"})
+        row = self.client.get("/posts").data["results"][0]
+        self.assertIsNone(row["thumbnail"])
+
+
+class AsyncViewsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="tester", password="pw")
+        tag = Tag.objects.create(name="hot", post_cnt=7)
+        cls.posts = []
+        for i in range(7):
+            post = Post.objects.create(title=f"title{i}", writer="w", content="#hot", like_cnt=i)
+            post.tag.add(tag, through_defaults={"created_at": post.created_at})
+            cls.posts.append(post)
+        for i in range(12):
+            Comment.objects.create(post=cls.posts[0], writer=cls.user, content=f"c{i}")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def assertSameBody(self, sync_url, async_url=None):
+        expected = self.client.get(sync_url)
+        actual = self.client.get(async_url or "/async" + sync_url)
+        self.assertEqual(actual.status_code, expected.status_code)
+        # pagination links point back at whichever endpoint served the page
+        body = json.loads(actual.content.decode().replace("/async/", "/"))
+        self.assertEqual(body, expected.json())
+
+    def test_post_list(self):
+        self.assertSameBody("/posts?ordering=-created_at&page=2")
+        self.assertSameBody("/posts?ordering=-like_cnt&page_size=3")
+        self.assertSameBody("/posts?pagination=cursor&ordering=-like_cnt")
+        self.assertEqual(self.client.get("/async/posts?page=9").status_code, 404)
+
+    def test_post_detail(self):
+        self.assertSameBody(f"/posts/{self.posts[0].id}")
+        self.assertSameBody("/posts/999")
+
+    def test_comments_and_tag_page(self):
+        self.assertSameBody(f"/posts/{self.posts[0].id}/comments")
+        self.assertSameBody(f"/posts/{self.posts[0].id}/comments?pagination=cursor")
+        self.assertSameBody("/tags/hot")
+        self.assertSameBody("/tags/cold")
+
+    def test_recommend(self):
+        self.assertSameBody("/posts/recommend?window=7d")
+
+    def test_comments_require_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(f"/async/posts/{self.posts[0].id}/comments").status_code, 403)
+
+    async def test_runs_on_the_event_loop(self):
+        response = await self.async_client.get(f"/async/posts/{self.posts[0].id}")
+        self.assertEqual(response.json()["id"], self.posts[0].id)
+        self.assertEqual(len(response.json()["comments"]), 10)
+
+
+class QueryPlanTest(TestCase):
+    # a bare "SCAN post_post" reads the whole table; SEARCH and index scans don't
+    FULL_SCAN = re.compile(r"^SCAN (TABLE )?\w+$")
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(username="admin", password="pw")
+        tag = Tag.objects.create(name="django", post_cnt=20)
+        cls.posts = Post.objects.bulk_create(
+            [Post(title=f"title{i}", writer=f"writer{i % 3}", content="#django") for i in range(20)]
+        )
+        for post in cls.posts:
+            post.tag.add(tag, through_defaults={"created_at": post.created_at})
+        Comment.objects.bulk_create([Comment(post=cls.posts[0], writer=cls.user, content="c") for _ in range(20)])
+        PostReaction.objects.create(post=cls.posts[0], user=cls.user, reaction="like")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def plan(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def plans(self, url):
+        """(sql, plan) of every post query run to answer url."""
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return [
+            (sql, self.plan(sql, params)) for sql, params in statements
+            if sql.startswith("SELECT") and "django_session" not in sql and "auth_user" not in sql
+        ], response
+
+    def full_scans(self, url):
+        scans = []
+        for sql, plan in self.plans(url)[0]:
+            # an unfiltered page straight off the table only reads the rows it returns
+            bounded = " LIMIT " in sql and " WHERE " not in sql and not any("TEMP B-TREE" in step for step in plan)
+            scans += [(sql, step) for step in plan if self.FULL_SCAN.match(step) and not bounded]
+        return scans
+
+    def test_endpoints_use_indexes(self):
+        post_id = self.posts[0].id
+        urls = [
+            "/posts", "/posts?ordering=-created_at", "/posts?ordering=-updated_at&page=2",
+            "/posts?pagination=cursor", "/posts?pagination=cursor&ordering=-like_cnt",
+            "/posts?title=title3", "/posts?writer=writer1", "/posts?tag__name=django", "/posts?search=django",
+            f"/posts/{post_id}", f"/posts/{post_id}/comments", f"/posts/{post_id}/comments?pagination=cursor",
+            "/posts/recommend", "/posts/top5", "/tags/django",
+        ]
+        for url in urls:
+            self.assertEqual(self.full_scans(url), [], url)
+
+    def test_tag_pages_read_the_link_index(self):
+        statements, response = self.plans("/tags/django?page_size=3")
+        statements += self.plans(response.data["next"])[0]
+        pages = [plan for sql, plan in statements if "post_post_tag" in sql and " LIMIT " in sql]
+        self.assertEqual(len(pages), 2)
+        for plan in pages:
+            self.assertIn("post_tag_created_idx", " ".join(plan))
+            # no sort of every post carrying the tag
+            self.assertNotIn("TEMP B-TREE", " ".join(plan))
+
+    def test_reaction_counts_come_from_the_covering_index(self):
+        queryset = PostReaction.objects.filter(post=self.posts[0]).values("reaction").annotate(n=Count("id"))
+        sql, params = queryset.query.sql_with_params()
+        self.assertIn("USING COVERING INDEX reaction_post_reaction_idx", " ".join(self.plan(sql, params)))
+
+
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="admin", password="pw")
+        cls.user = User.objects.create_user(username="tester", password="pw")
+        cls.post = Post.objects.create(title="title", writer="w", content="content")
+
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+
+    def scrape(self):
+        self.client.force_login(self.admin)
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        return response.content.decode()
+
+    def test_records_per_view_and_action(self):
+        body = self.client.get(f"/posts/{self.post.id}").content
+        self.client.get("/posts")
+        self.client.get("/posts")
+
+        text = self.scrape()
+        detail = 'view="post:posts-detail",action="retrieve",method="GET"'
+        self.assertIn(f'post_requests_total{{{detail},status="200"}} 1', text)
+        # conditional validator, post, tags, comments
+        self.assertIn(f"post_request_queries_sum{{{detail}}} 4", text)
+        self.assertIn(f"post_response_size_bytes_sum{{{detail}}} {len(body)}", text)
+        self.assertIn('post_request_duration_seconds_count{view="post:posts-list",action="list",method="GET"} 2', text)
+        self.assertIn('post_request_duration_seconds_bucket{view="post:posts-list",action="list",method="GET",le="+Inf"} 2', text)
+
+    def test_serialization_times_the_render_only(self):
+        compress = CompressionMiddleware.process_response
+
+        def slow_compress(*args):
+            time.sleep(0.05)
+            return compress(*args)
+
+        with mock.patch.object(CompressionMiddleware, "process_response", slow_compress):
+            self.client.get("/posts")
+        histograms = metrics.registry.views["post:posts-list", "list", "GET"]
+        self.assertEqual(histograms.serialization.count, 1)
+        self.assertGreater(histograms.serialization.sum, 0)
+        self.assertLess(histograms.serialization.sum, 0.05)
+        self.assertGreaterEqual(histograms.duration.sum, 0.05)
+
+    def test_admin_only(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+
+    @override_settings(METRICS_TRACE_SAMPLE_RATE=1, METRICS_TRACE_QUERIES=2)
+    def test_logs_sampled_slow_requests(self):
+        with self.assertLogs("post.metrics", "WARNING") as logs:
+            self.client.get("/posts")
+        self.assertIn("slow request GET /posts (post:posts-list/list)", logs.output[0])
+        self.assertIn('FROM "post_post"', logs.output[0])
+
+    @override_settings(METRICS_TRACE_SAMPLE_RATE=0, METRICS_TRACE_QUERIES=0, METRICS_TRACE_LATENCY_MS=0)
+    def test_unsampled_requests_are_not_traced(self):
+        with self.assertNoLogs("post.metrics"):
+            self.client.get("/posts")
+
+
+class SQLiteTuningTest(TestCase):
+    def test_pragmas_are_applied(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)  # DATABASES OPTIONS timeout, in ms
+
+
+@override_settings(SQLITE_LOCK_RETRIES=3, SQLITE_LOCK_BACKOFF=0)
+class RetryOnLockedTest(SimpleTestCase):
+    def flaky(self, failures, message="database is locked"):
+        calls = []
+
+        @retry_on_locked
+        def write():
+            calls.append(1)
+            if len(calls) <= failures:
+                raise OperationalError(message)
+            return "ok"
+
+        return write, calls
+
+    def test_retries_lock_errors(self):
+        write, calls = self.flaky(2)
+        self.assertEqual(write(), "ok")
+        self.assertEqual(len(calls), 3)
+
+    def test_gives_up_after_the_last_attempt(self):
+        write, calls = self.flaky(3)
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 3)
+
+    def test_other_errors_are_not_retried(self):
+        write, calls = self.flaky(1, "no such table: post_post")
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 1)
@@ -0,0 +1,113 @@
+"""
+Rate limits for the write endpoints, counted in the cache.
+
+A view opts in per action with a ``throttle_scopes`` map, for example
+``{"likes": "reaction"}``. The limits for each scope live in
+settings.POST_THROTTLE_RATES, one per user and one per client IP, in DRF's
+"number/period" format. A limit set to None is not applied. Anonymous
+requests only count against the IP limit.
+
+Each limit is a sliding window counter. The cache holds one integer for the
+current fixed window and one for the previous window. The request count is
+the current count plus the previous count weighted by how much of the
+previous window still overlaps the sliding one. A check costs one get_many
+for all keys, plus an add or incr for each limit when the request is let
+through. Both are atomic in every Django cache backend. Memory per client is
+constant, while DRF's SimpleRateThrottle stores and rewrites a list of every
+timestamp in the window. When a request is throttled, wait() gives DRF the
+Retry-After value: the seconds until the weighted count falls back under the
+limit.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def _cache():
+    return caches[getattr(settings, "POST_THROTTLE_CACHE", "default")]
+
+
+def _rates(scope):
+    return getattr(settings, "POST_THROTTLE_RATES", {}).get(scope, {})
+
+
+def parse_rate(rate):
+    """'30/min' -> (30, 60)"""
+    num, period = rate.split("/")
+    return int(num), PERIODS[period[0]]
+
+
+def weighted_count(previous, current, elapsed, window):
+    return previous * (1 - elapsed / window) + current
+
+
+def seconds_until_allowed(previous, current, elapsed, window, limit):
+    """Seconds until weighted_count drops to limit - 1, so one more request fits."""
+    room = limit - 1
+    if room < 0:
+        return window
+    if current <= room:
+        if previous == 0:
+            return 0
+        # the previous window's share decays linearly to zero at the window's end
+        return max(0, window * (1 - (room - current) / previous) - elapsed)
+    # only the next window has room: the current count becomes the decaying previous one
+    return window - elapsed + window * (1 - room / current)
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    timer = time.time
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_limits(self, request, view):
+        """[(cache key, limit, window seconds)] that apply to request."""
+        scope = getattr(view, "throttle_scopes", {}).get(getattr(view, "action", None))
+        if scope is None:
+            return []
+        limits = []
+        rates = _rates(scope)
+        if rates.get("user") and request.user and request.user.is_authenticated:
+            limits.append((f"throttle:{scope}:user:{request.user.pk}", *parse_rate(rates["user"])))
+        if rates.get("ip"):
+            limits.append((f"throttle:{scope}:ip:{self.get_ident(request)}", *parse_rate(rates["ip"])))
+        return limits
+
+    def allow_request(self, request, view):
+        limits = self.get_limits(request, view)
+        if not limits:
+            return True
+        now = self.timer()
+        windows = []
+        for key, limit, window in limits:
+            index = int(now // window)
+            windows.append((f"{key}:{index}", f"{key}:{index - 1}", limit, window, now - index * window))
+        counts = _cache().get_many([k for current, previous, *_ in windows for k in (current, previous)])
+
+        waits = []
+        for current, previous, limit, window, elapsed in windows:
+            c, p = counts.get(current, 0), counts.get(previous, 0)
+            if weighted_count(p, c, elapsed, window) + 1 > limit:
+                waits.append(seconds_until_allowed(p, c, elapsed, window, limit))
+        if waits:
+            self.wait_seconds = max(1, math.ceil(max(waits)))
+            return False
+
+        cache = _cache()
+        for current, _, _, window, _ in windows:
+            # the key has to outlive the window after it, where it is the previous count
+            if not cache.add(current, 1, timeout=2 * window):
+                try:
+                    cache.incr(current)
+                except ValueError:  # expired between add and incr
+                    cache.add(current, 1, timeout=2 * window)
+        return True
+
+    def wait(self):
+        return self.wait_seconds
@@ -3,6 +3,8 @@ from django.conf.urls.static import static
 from django.conf import settings
 from rest_framework import routers
 from .views import *
+from . import async_views
+from .metrics import metrics_view
 
 
 
@@ -20,10 +22,22 @@ post_comment_router.register("comments",PostCommentViewSet,basename="comments")
 tag_router = routers.SimpleRouter(trailing_slash=False)
 tag_router.register("tags", TagViewSet, basename="tags")
 
+feed_router = routers.SimpleRouter(trailing_slash=False)
+feed_router.register("feed", FeedViewSet, basename="feed")
+
 urlpatterns = [
     path("", include(default_router.urls)),
     path("", include(comment_router.urls)),
     path("posts/<int:post_id>/", include(post_comment_router.urls)),
     path("", include(tag_router.urls)),
+    path("", include(feed_router.urls)),
+
+    path("async/posts", async_views.post_list, name="async-posts-list"),
+    path("async/posts/recommend", async_views.recommend, name="async-posts-recommend"),
+    path("async/posts/<int:post_id>", async_views.post_detail, name="async-posts-detail"),
+    path("async/posts/<int:post_id>/comments", async_views.post_comments, name="async-comments-list"),
+    path("async/tags/<str:tag_name>", async_views.tag_page, name="async-tags-detail"),
+
+    path("metrics", metrics_view, name="metrics"),
 
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -1,37 +1,81 @@
 from django.shortcuts import render
-from rest_framework import viewsets, mixins
+from rest_framework import generics, viewsets, mixins
 from rest_framework.response import Response
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from django.shortcuts import get_object_or_404
 
 from .paginations import *
 from .models import *
 from .serializers import *
 from .permissions import IsOwnerOrReadOnly
+from . import archive, bulk, detail_cache, feed, leaderboard, scoring
+from .bulk import NDJSONParser
+from .feed import FeedPagination
+from .signals import send_post_changed
+from .db import retry_on_locked
+from .tags import extract_hashtags, release_post_tags, set_post_tags, tag_posts
+from .conditional import condition, post_list_validator, post_validator, tag_validator
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import OrderingFilter
+from .search import PostSearchFilter
 from django.conf import settings
-from django.db.models import Q, Count
+from django.db import IntegrityError, transaction
+from django.http import Http404, StreamingHttpResponse
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
 import os
 # Create your views here.
-class PostViewSet(viewsets.ModelViewSet):
-    queryset = Post.objects.annotate(
-        like_cnt = Count(
-            "reactions", filter = Q(reactions__reaction= "like"), distinct = True
-            ),
-        dislike_cnt = Count(
-            "reactions", filter = Q(reactions__reaction= "dislike"), distinct = True
-        ),
-    )
+class PostViewSet(SelectablePaginationMixin, viewsets.ModelViewSet):
+    queryset = Post.objects.prefetch_related("tag")
     # serializer_class = PostSerializer
-    filter_backends =[DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends =[DjangoFilterBackend, PostSearchFilter, OrderingFilter]
     
     filterset_fields = ["title", "writer", "tag__name"]
-    search_fields = ["title", "writer", "=tag__name"]
     ordering_fields = ["created_at", "updated_at", "like_cnt", "dislike_cnt"]
 
     pagination_class = PostPagination
+    cursor_pagination_class = PostCursorPagination
+    throttle_scopes = {"likes": "reaction", "dislikes": "reaction", "reactions": "reaction"}
+
+    @condition(post_list_validator)
+    def list(self, request, *args, **kwargs):
+        # same output as PostListSerializer, rendered from a values() projection
+        queryset = PostListProjection.project(self.filter_queryset(self.get_queryset()))
+        projection = PostListProjection(self.get_serializer_context())
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(projection.data(list(queryset)))
+        return self.get_paginated_response(projection.data(page))
+
+    @condition(post_validator)
+    def retrieve(self, request, *args, **kwargs):
+        # one entry per post, whatever the URL spelled ("01")
+        try:
+            pk = int(kwargs["pk"])
+        except ValueError:
+            raise Http404
+        if self.resource_version is None:
+            # the validator found no post; build_detail answers 404
+            return Response(self.build_detail(pk))
+        data = detail_cache.get_or_build(
+            pk,
+            self.resource_version,
+            f"{request.scheme}://{request.get_host()}",
+            lambda: self.build_detail(pk),
+        )
+        return Response(data)
+
+    def build_detail(self, pk):
+        try:
+            return self.get_serializer(self.get_object()).data
+        except Http404:
+            # not in the hot tables, maybe moved out by post.archive
+            post = archive.get_post(pk)
+            if post is None:
+                raise
+            return ArchivedPostSerializer(post, context=self.get_serializer_context()).data
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -39,9 +83,9 @@ class PostViewSet(viewsets.ModelViewSet):
         return PostSerializer
     
     def get_permissions(self):
-        if self.action in ["create","update","destroy","partial_update"]:
+        if self.action in ["create","update","destroy","partial_update","export_posts","import_posts"]:
             return [IsAdminUser()]
-        elif self.action in ["likes"]:
+        elif self.action in ["likes", "dislikes", "reactions"]:
             return [IsAuthenticated()]
         return []
 
@@ -51,77 +95,143 @@ class PostViewSet(viewsets.ModelViewSet):
         self.perform_create(serializer)
 
         post = serializer.instance
-        self.handle_tags(post)
-
-        if 'image' in request.FILES:
-            post.image = request.FILES['image']
-            post.save()
+        self.handle_tags(post, new=True)
 
+        leaderboard.invalidate()
         return Response(serializer.data)
 
     def perform_update(self, serializer):
         post = serializer.save()
-        post.tag.clear()
 
         self.handle_tags(post)
+        leaderboard.invalidate()
 
-    def handle_tags(self, post):
-        words = post.content.split(' ')
-        tag_list = []
-        for w in words:
-            if w[0]=='#':
-                tag_list.append(w[1:])
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            release_post_tags(instance)
+            instance.delete()
+        leaderboard.invalidate()
 
-        for t in tag_list:
-            tag, created = Tag.objects.get_or_create(name = t)
-            post.tag.add(tag)
+    def handle_tags(self, post, new=False):
+        set_post_tags(post, extract_hashtags(post.content))
+        feed.fan_out([post], new=new)
 
-        post.save()
+    def get_leaderboard_window(self):
+        window = self.request.query_params.get("window", leaderboard.DEFAULT_WINDOW)
+        if window not in leaderboard.WINDOWS:
+            raise ValidationError({"window": f"choose one of {', '.join(leaderboard.WINDOWS)}"})
+        return window
 
     @action(methods=["GET"],detail=False)
     def recommend(self, request):
-        recommended_post = self.get_queryset().order_by("-like_cnt")[:3]
-        recommended_post_serializer = PostListSerializer(recommended_post, many = True)
-        return Response(recommended_post_serializer.data)
+        return Response(leaderboard.get_top(self.get_leaderboard_window(), 3, "hot"))
     
     @action(methods=["POST"], detail= True, permission_classes = [IsAuthenticated])
+    @retry_on_locked
     def likes(self, request, pk=None):
-        post = self.get_object()
-        reaction = PostReaction.objects.filter(post=post, user=request.user).first()
-        if reaction:
-            if reaction.reaction == "like":
-                reaction.delete()
-            else:
-                reaction.reaction = "like"
-                reaction.save()
-        else:
-            PostReaction.objects.create(post=post, user=request.user, reaction="like")
+        post = self.get_reaction_post()
+        self.toggle_reaction(post, request.user, "like")
         return Response()
     
     @action(methods=["POST"], detail= True, permission_classes = [IsAuthenticated])
+    @retry_on_locked
     def dislikes(self, request, pk=None):
-        post = self.get_object()
-        reaction = PostReaction.objects.filter(post=post, user=request.user).first()
-        if reaction:
-            if reaction.reaction == "dislike":
-                reaction.delete()
-            else:
-                reaction.reaction = "dislike"
-                reaction.save()
-        else:
-            PostReaction.objects.create(post=post, user=request.user, reaction="dislike")
+        post = self.get_reaction_post()
+        self.toggle_reaction(post, request.user, "dislike")
         return Response()
+
+    @action(methods=["POST"], detail= False, permission_classes = [IsAuthenticated])
+    @retry_on_locked
+    def reactions(self, request):
+        serializer = ReactionBatchSerializer(data = request.data)
+        serializer.is_valid(raise_exception = True)
+        # later entries for the same post win, so a replayed offline queue is idempotent
+        wanted = {item["post"]: item["reaction"] for item in serializer.validated_data["reactions"]}
+
+        with transaction.atomic():
+            found = set(Post.objects.filter(pk__in=wanted).values_list("pk", flat=True))
+            current = dict(
+                PostReaction.objects.select_for_update()
+                .filter(post__in=found, user=request.user)
+                .values_list("post", "reaction")
+            )
+            changes = {
+                pk: (current.get(pk), wanted[pk]) for pk in found if current.get(pk) != wanted[pk]
+            }
+            cleared = [pk for pk, (old, new) in changes.items() if new is None]
+            if cleared:
+                PostReaction.objects.filter(post__in=cleared, user=request.user).delete()
+            PostReaction.objects.bulk_create(
+                [
+                    PostReaction(post_id=pk, user=request.user, reaction=new)
+                    for pk, (old, new) in changes.items() if new is not None
+                ],
+                update_conflicts=True,
+                unique_fields=["post", "user"],
+                update_fields=["reaction"],
+            )
+            self.apply_reaction_counters(changes)
+
+        return Response({"applied": len(changes), "missing": sorted(set(wanted) - found)})
+
+    def get_reaction_post(self):
+        # only the pk is used, so not through the queryset's tag prefetch
+        post = generics.get_object_or_404(Post.objects.only("pk"), pk=self.kwargs["pk"])
+        self.check_object_permissions(self.request, post)
+        return post
+
+    def toggle_reaction(self, post, user, kind):
+        other = "dislike" if kind == "like" else "like"
+        with transaction.atomic():
+            # the (post, user) unique constraint makes the insert the race-free common path
+            try:
+                with transaction.atomic():
+                    PostReaction.objects.create(post=post, user=user, reaction=kind)
+                change = (None, kind)
+            except IntegrityError:
+                if PostReaction.objects.filter(post=post, user=user, reaction=kind).delete()[0]:
+                    change = (kind, None)
+                elif PostReaction.objects.filter(post=post, user=user).update(reaction=kind):
+                    change = (other, kind)
+                else:
+                    return
+            self.apply_reaction_counters({post.pk: change})
+
+    def apply_reaction_counters(self, changes):
+        """changes maps post id -> (old reaction, new reaction); either may be None."""
+        counters = {}
+        for kind in ("like", "dislike"):
+            deltas = [
+                When(pk=pk, then=Value((new == kind) - (old == kind)))
+                for pk, (old, new) in changes.items() if (old == kind) != (new == kind)
+            ]
+            if deltas:
+                counters[f"{kind}_cnt"] = F(f"{kind}_cnt") + Case(*deltas, default=Value(0))
+        if counters:
+            Post.objects.filter(pk__in=changes).update(activity_at=timezone.now(), **counters)
+            scoring.refresh(changes)
+            send_post_changed(PostReaction, changes)
+        for pk in changes:
+            transaction.on_commit(lambda pk=pk: leaderboard.update(pk))
     
     @action(methods=["GET"], detail= False)
     def top5(self, request):
-        queryset = self.get_queryset().order_by("-like_cnt")[:5]
-        serializer = PostListSerializer(queryset, many = True)
-        return Response(serializer.data)
+        return Response(leaderboard.get_top(self.get_leaderboard_window(), 5))
+
+    @action(methods=["GET"], detail=False, url_path="export")
+    def export_posts(self, request):
+        response = StreamingHttpResponse(bulk.export_lines(), content_type=NDJSONParser.media_type)
+        response["Content-Disposition"] = 'attachment; filename="posts.ndjson"'
+        return response
+
+    @action(methods=["POST"], detail=False, url_path="import", parser_classes=[NDJSONParser])
+    def import_posts(self, request):
+        return Response(bulk.import_lines(request.data))
 
 
 class CommentViewSet(viewsets.GenericViewSet,
     mixins.RetrieveModelMixin, mixins.UpdateModelMixin, mixins.DestroyModelMixin):
-    queryset = Comment.objects.all()
+    queryset = Comment.objects.select_related("post")
     serializer_class =  CommentSerializer
 
     def get_permissions(self):
@@ -133,12 +243,28 @@ class CommentViewSet(viewsets.GenericViewSet,
         obj = super().get_object()
         return obj
 
+    def perform_update(self, serializer):
+        comment = serializer.save()
+        Post.objects.filter(pk=comment.post_id).update(activity_at=timezone.now())
+
+    @retry_on_locked
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            Post.objects.filter(pk=instance.post_id).update(
+                comments_cnt=F("comments_cnt") - 1, activity_at=timezone.now()
+            )
+            scoring.refresh([instance.post_id])
+            transaction.on_commit(lambda: leaderboard.update(instance.post_id))
+
 
-class PostCommentViewSet(viewsets.GenericViewSet,
+class PostCommentViewSet(SelectablePaginationMixin, viewsets.GenericViewSet,
     mixins.ListModelMixin, mixins.CreateModelMixin):
     # queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated]
+    cursor_pagination_class = CommentCursorPagination
+    throttle_scopes = {"create": "comment"}
 
     # def list(self, request, post_id = None):
     #     post = get_object_or_404(Post, id = post_id)
@@ -146,17 +272,37 @@ class PostCommentViewSet(viewsets.GenericViewSet,
     #     serializer = self.get_serializer(queryset, many = True)
     #     return Response(serializer.data)
 
+    archived = False
+
+    @condition(post_validator)
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        comments = response.data["results"] if isinstance(response.data, dict) else response.data
+        # only an empty page costs the archive lookup
+        if not comments and archive.is_archived(self.kwargs.get("post_id")):
+            self.archived = True
+            response = super().list(request, *args, **kwargs)
+        return response
+
     def get_queryset(self):
         post = self.kwargs.get("post_id")
-        queryset = Comment.objects.filter(post_id = post)
+        model = ArchivedComment if self.archived else Comment
+        queryset = model.objects.filter(post_id = post).select_related("post")
         return queryset
 
 
+    @retry_on_locked
     def create(self, request, post_id = None):
         post = get_object_or_404(Post, id = post_id)
         serializer = self.get_serializer(data = request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save(post=post)
+        with transaction.atomic():
+            serializer.save(post=post)
+            Post.objects.filter(pk=post.pk).update(
+                comments_cnt=F("comments_cnt") + 1, activity_at=timezone.now()
+            )
+            scoring.refresh([post.pk])
+            transaction.on_commit(lambda: leaderboard.update(post.pk))
         return Response(serializer.data)
     
 class TagViewSet(viewsets.GenericViewSet,
@@ -165,11 +311,34 @@ class TagViewSet(viewsets.GenericViewSet,
     serializer_class = TagSerializer
     lookup_field = "name"
     lookup_url_kwarg = "tag_name"
+    pagination_class = TagPagination
 
+    @condition(tag_validator)
     def retrieve(self, request, *args, **kwargs):
-        tag_name = kwargs.get("tag_name")
-        tag = get_object_or_404(Tag, name = tag_name)
-        posts = Post.objects.filter(tag = tag)
-        serializer = PostSerializer(posts, many =True)
+        tag = self.get_object()
+        posts = self.paginate_queryset(PostListProjection.project(tag_posts(tag)))
+        response = self.get_paginated_response(PostListProjection(self.get_serializer_context()).data(posts))
+        response.data = {"name": tag.name, "post_cnt": tag.post_cnt, **response.data}
+        return response
+
+    @action(methods=["POST", "DELETE"], detail=True, permission_classes=[IsAuthenticated])
+    @retry_on_locked
+    def follow(self, request, tag_name=None):
+        tag = self.get_object()
+        if request.method == "POST":
+            feed.follow(request.user, tag)
+        else:
+            feed.unfollow(request.user, tag)
+        return Response({
+            "name": tag.name, "following": request.method == "POST", "follower_cnt": tag.follower_cnt,
+        })
+
+
+class FeedViewSet(viewsets.GenericViewSet):
+    # posts of the tags the user follows, newest first, see post.feed
+    permission_classes = [IsAuthenticated]
+    pagination_class = FeedPagination
 
-        return Response(serializer.data)
\ No newline at end of file
+    def list(self, request):
+        posts = self.paginator.paginate_feed(request.user, request)
+        return self.get_paginated_response(PostListProjection(self.get_serializer_context()).data(posts))
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -44,6 +45,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'post.metrics.MetricsMiddleware',
+    'post.compression.CompressionMiddleware',
+    'post.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,6 +57,23 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# DRF defaults with JSON handled by orjson, see post.renderers
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'post.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'post.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # only limits the actions a view lists in throttle_scopes, see post.throttles
+    'DEFAULT_THROTTLE_CLASSES': [
+        'post.throttles.SlidingWindowThrottle',
+    ],
+}
+
 ROOT_URLCONF = 'project.urls'
 
 TEMPLATES = [
@@ -81,9 +102,119 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # seconds the sqlite3 module waits on a locked database (it sets
+            # SQLite's busy_timeout); post.db.retry_on_locked retries after it
+            'timeout': 5,
+        },
+    },
+}
+
+# post.routers: aliases safe-method requests read from (comma-separated in the
+# environment, e.g. POST_READ_REPLICAS=replica), and how long a client that
+# wrote keeps reading from the primary so it sees its own changes
+DATABASE_ROUTERS = ['post.routers.ReplicaRouter']
+POST_READ_REPLICAS = [alias for alias in os.environ.get('POST_READ_REPLICAS', '').split(',') if alias]
+POST_REPLICA_STICKY_SECONDS = 5
+
+# local stand-ins for the replicas, copied from the primary with
+# `manage.py sync_replica`. Only defined when replicas are configured, or for
+# the test suite's routing tests, so no other command creates their files.
+for alias in POST_READ_REPLICAS or (['replica'] if sys.argv[1:2] == ['test'] else []):
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'{alias}.sqlite3',
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'timeout': 5,
+        },
+    }
+
+# applied to every new SQLite connection by post.db.configure_sqlite; the
+# busy timeout is DATABASES[...]['OPTIONS']['timeout'], not a PRAGMA here
+SQLITE_PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'cache_size': -20000,             # KiB, negative means size rather than pages
+    'mmap_size': 128 * 1024 * 1024,   # bytes
+    'temp_store': 'MEMORY',
+}
+# journal_mode, unlike the PRAGMAs above, is written into the database file
+# itself: setting it would rewrite the db.sqlite3 checked into the repository
+# on the first connection of any command. Deployments opt in with
+# SQLITE_JOURNAL_MODE=WAL for their own database file.
+if os.environ.get('SQLITE_JOURNAL_MODE'):
+    SQLITE_PRAGMAS['journal_mode'] = os.environ['SQLITE_JOURNAL_MODE']
+# post.db.retry_on_locked: attempts and base backoff (seconds) for write views
+SQLITE_LOCK_RETRIES = 3
+SQLITE_LOCK_BACKOFF = 0.05
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+# post.leaderboard: cache alias, posts kept per time window and refresh interval
+LEADERBOARD_CACHE = 'default'
+LEADERBOARD_SIZE = 10
+LEADERBOARD_TIMEOUT = 300
+
+# post.scoring: weights of likes, dislikes and comments in the hot score that
+# ranks recommend, and how many hours newer a post may be to need 10x the
+# engagement; rerun recompute_hot_scores after changing them
+POST_HOT_SCORE = {"like": 1.0, "dislike": 1.0, "comment": 0.5, "decay_hours": 12.5}
+
+# post.throttles: per-scope request limits for each user and each client IP,
+# and the cache alias the counters live in
+POST_THROTTLE_CACHE = 'default'
+POST_THROTTLE_RATES = {
+    'reaction': {'user': '60/min', 'ip': '600/min'},
+    'comment': {'user': '10/min', 'ip': '100/min'},
+}
+
+# post.detail_cache: cache alias, entry lifetime and how long a request waits
+# for another one rebuilding the same entry
+POST_DETAIL_CACHE = 'default'
+POST_DETAIL_CACHE_TIMEOUT = 300
+POST_DETAIL_CACHE_LOCK_WAIT = 0.5
+
+# comments embedded in a post detail body; the rest are paged from /posts/{id}/comments
+POST_DETAIL_COMMENTS = 10
+
+# post.search backend (dotted path); None picks one from the database vendor
+POST_SEARCH_BACKEND = None
+
+# post.compression: bodies under this many bytes go out uncompressed, and the
+# encodings offered in order of preference (br needs the brotli package)
+POST_COMPRESSION_MIN_SIZE = 1024
+POST_COMPRESSION_ENCODINGS = ['br', 'gzip']
+
+# post.feed: tags with this many followers are merged into feeds at read time
+# instead of fanned out on write, and how many of a tag's latest posts are
+# copied into a feed when it is followed
+POST_FEED_FANOUT_LIMIT = 1000
+POST_FEED_BACKFILL = 50
+
+# post.archive: posts created and last active this many days ago are moved
+# to the archive tables by the archive_posts command
+POST_ARCHIVE_AFTER_DAYS = 365
+
+# post.bulk: lines per import transaction, and rows fetched per query on export
+POST_BULK_BATCH_SIZE = 1000
+POST_BULK_CHUNK_SIZE = 2000
+
+# post.metrics: share of requests that keep their SQL, logged when the request
+# runs more than METRICS_TRACE_QUERIES queries or takes over METRICS_TRACE_LATENCY_MS
+METRICS_TRACE_SAMPLE_RATE = 0.1
+METRICS_TRACE_QUERIES = 30
+METRICS_TRACE_LATENCY_MS = 500
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -127,4 +258,10 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
-MEDIA_URL = "/media/"
\ No newline at end of file
+MEDIA_URL = "/media/"
+
+# post.images: resized copies (longest side in px) built per upload, and the
+# worker threads building them; POST_IMAGE_SYNC builds them inline instead
+POST_IMAGE_VARIANTS = {"thumbnail": 320}
+POST_IMAGE_WORKERS = 2
+POST_IMAGE_SYNC = False
\ No newline at end of file